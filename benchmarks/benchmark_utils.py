@@ -0,0 +1,17 @@
+import time
+
+
+def measure(function, repeat=3):
+    best_time, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return best_time, result
+
+
+def print_table(header, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print('  '.join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,60 @@
+import argparse
+import numpy as np
+from benchmarks.benchmark_utils import measure, print_table
+from source.filter_logic import FilterBuilder
+from source.signal_logic import SignalProcessor
+from source.analysis_utils import get_snr
+
+
+def build_filter(dtype, accumulation_dtype=None, in_taps=8, out_taps=2):
+    builder = FilterBuilder()
+    filter = builder.get_new_filter(0.01, dtype, accumulation_dtype)
+    for _ in range(in_taps):
+        builder.add_weight(filter, 'in', 0.1)
+    for _ in range(out_taps):
+        builder.add_weight(filter, 'out', 0.05)
+    return filter
+
+
+def get_signals(dtype, n_points):
+    processor = SignalProcessor(dtype)
+    x, y = processor.get_empty(0, 20, n_points)
+    clean_y = processor.add_sine(x, y, frequency=3)
+    noised_y = processor.add_noise(x, clean_y, amplitude=0.3, rng=0)
+    return clean_y, noised_y
+
+
+def get_error(reference, candidate):
+    reference = np.asarray(reference, dtype=np.float64)
+    error = np.max(np.abs(np.asarray(candidate, dtype=np.float64) - reference))
+    return error, error / max(np.max(np.abs(reference)), 1e-300)
+
+
+def main(n_points, filter_points):
+    modes = [('float64', None), ('float32', None), ('float32', 'float64')]
+    results = dict()
+    for dtype, accumulation_dtype in modes:
+        clean_y, noised_y = get_signals(dtype, n_points)
+        mode_results = dict()
+        mode_results['add_sine'] = measure(lambda: SignalProcessor(dtype).add_sine(np.linspace(0, 20, n_points), clean_y, 5))
+        mode_results['snr'] = measure(lambda: get_snr(clean_y, noised_y))
+        mode_results['train'] = measure(lambda: build_filter(dtype, accumulation_dtype).train(clean_y[:filter_points], noised_y[:filter_points]), 1)
+        mode_results['predict'] = measure(lambda: build_filter(dtype, accumulation_dtype).predict(noised_y[:filter_points]), 1)
+        results[(dtype, accumulation_dtype)] = mode_results
+
+    rows = list()
+    reference = results[modes[0]]
+    for mode in modes:
+        for operation, (elapsed, output) in results[mode].items():
+            absolute_error, relative_error = get_error(reference[operation][1], output)
+            rows.append([f'{mode[0]}/{mode[1] or mode[0]}', operation, f'{elapsed * 1000:.2f}',
+                         f'{reference[operation][0] / elapsed:.2f}x', f'{absolute_error:.2e}', f'{relative_error:.2e}'])
+    print_table(['dtype/accumulation', 'operation', 'time, ms', 'speedup', 'max abs error', 'max rel error'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare float32 and float64 processing modes.')
+    parser.add_argument('--points', type=int, default=2_000_000)
+    parser.add_argument('--filter-points', type=int, default=50_000)
+    arguments = parser.parse_args()
+    main(arguments.points, arguments.filter_points)
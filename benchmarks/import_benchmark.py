@@ -0,0 +1,67 @@
+import argparse
+import json
+import subprocess
+import sys
+from benchmarks.benchmark_utils import print_table
+
+
+HEADLESS_MODULES = {
+    'source': 5,
+    'source.filter_logic': 20,
+    'source.signal_logic': 20,
+    'source.analysis_utils': 20,
+    'source.filter_io': 50,
+    'source.filter_manager': 60,
+    'source.ensemble_logic': 60,
+    'source.training_logic': 60,
+}
+GUI_MODULES = ['PyQt5', 'matplotlib']
+PRELOADED_MODULES = ['numpy']
+
+
+def get_import_times(module, preload=True):
+    statement = f'import {module}'
+    if preload:
+        statement = '; '.join([f'import {name}' for name in PRELOADED_MODULES] + [statement])
+    statement += '; import sys; print(__import__("json").dumps(sorted(name for name in sys.modules)))'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                             capture_output=True, text=True, check=True)
+    times = dict()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times, json.loads(process.stdout.splitlines()[-1])
+
+
+def measure_module(module, repeat):
+    best_time, loaded_modules = None, None
+    for _ in range(repeat):
+        times, loaded_modules = get_import_times(module)
+        elapsed = times.get(module, 0.0)
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    cold_times, _ = get_import_times(module, preload=False)
+    gui_modules = sorted({name.split('.')[0] for name in loaded_modules} & set(GUI_MODULES))
+    return best_time, sum(time for name, time in cold_times.items() if '.' not in name), gui_modules
+
+
+def main(repeat, scale):
+    rows, failures = list(), list()
+    for module, budget in HEADLESS_MODULES.items():
+        elapsed, cold_elapsed, gui_modules = measure_module(module, repeat)
+        budget *= scale
+        status = 'OK' if elapsed <= budget and not gui_modules else 'FAIL'
+        if status != 'OK':
+            failures.append(module)
+        rows.append([module, f'{elapsed:.1f}', f'{budget:.0f}', f'{cold_elapsed:.1f}', ', '.join(gui_modules) or '-', status])
+    print_table(['module', 'import, ms', 'budget, ms', 'cold total, ms', 'GUI modules', 'status'], rows)
+    return len(failures) == 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check headless import times against a budget (numpy preloaded).')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for all budgets on slow machines')
+    arguments = parser.parse_args()
+    sys.exit(0 if main(arguments.repeat, arguments.scale) else 1)
@@ -0,0 +1,41 @@
+import argparse
+import numpy as np
+from benchmarks.benchmark_utils import measure, print_table
+from benchmarks.dtype_benchmark import build_filter, get_signals
+from source.multirate_logic import DecimatorStage, FilterStage, InterpolatorStage, MultiratePipeline, design_lowpass
+
+
+def run_full_rate(noised_y, factor):
+    filtered_y = build_filter('float64').predict(noised_y)
+    return np.convolve(filtered_y, design_lowpass(factor))[:len(filtered_y)][::factor]
+
+
+def run_pipeline(signal_space, noised_y, factor):
+    pipeline = MultiratePipeline([DecimatorStage(factor), FilterStage(build_filter('float64'))])
+    return pipeline.process(signal_space, noised_y)[1]
+
+
+def run_round_trip(signal_space, noised_y, factor):
+    pipeline = MultiratePipeline([DecimatorStage(factor), FilterStage(build_filter('float64')), InterpolatorStage(factor)])
+    return pipeline.process(signal_space, noised_y)[1]
+
+
+def main(n_points, factors):
+    signal_space = np.linspace(0, 20, n_points)
+    _, noised_y = get_signals('float64', n_points)
+    rows = list()
+    for factor in factors:
+        full_time, _ = measure(lambda: run_full_rate(noised_y, factor), 1)
+        pipeline_time, _ = measure(lambda: run_pipeline(signal_space, noised_y, factor), 1)
+        round_trip_time, _ = measure(lambda: run_round_trip(signal_space, noised_y, factor), 1)
+        rows.append([factor, f'{full_time * 1000:.1f}', f'{pipeline_time * 1000:.1f}', f'{full_time / pipeline_time:.1f}x',
+                     f'{round_trip_time * 1000:.1f}'])
+    print_table(['factor', 'full rate, ms', 'decimate+filter, ms', 'speedup', 'decimate+filter+interpolate, ms'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare full-rate filtering with a polyphase multirate pipeline.')
+    parser.add_argument('--points', type=int, default=200_000)
+    parser.add_argument('--factors', type=int, nargs='+', default=[2, 4, 8, 16])
+    arguments = parser.parse_args()
+    main(arguments.points, arguments.factors)
@@ -0,0 +1,36 @@
+import argparse
+import random
+import numpy as np
+from benchmarks.benchmark_utils import measure, print_table
+from source.signal_logic import get_uniform_noised
+
+
+def get_scalar_noised(clean_y):
+    return np.array([i + random.random()*2 - 1 for i in clean_y])
+
+
+def get_scalar_weights(size):
+    return np.array([random.random() for _ in range(size)])
+
+
+def main(n_points, weights):
+    clean_y = np.sin(np.linspace(0, 20, n_points))
+    rows = list()
+    for operation, size, scalar, bulk in [
+            ('noise', n_points, lambda: get_scalar_noised(clean_y),
+             lambda: get_uniform_noised(clean_y, rng=np.random.default_rng(0))),
+            ('weights', weights, lambda: get_scalar_weights(weights),
+             lambda: np.random.default_rng(0).random(weights))]:
+        scalar_time, _ = measure(scalar)
+        bulk_time, _ = measure(bulk)
+        rows.append([operation, size, f'{scalar_time * 1000:.2f}', f'{bulk_time * 1000:.2f}',
+                     f'{scalar_time / bulk_time:.1f}x'])
+    print_table(['operation', 'values', 'random.random, ms', 'Generator, ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare per-value random.random draws with bulk Generator draws.')
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--weights', type=int, default=4096)
+    arguments = parser.parse_args()
+    main(arguments.points, arguments.weights)
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import numpy as np
+from benchmarks.benchmark_utils import print_table
+from benchmarks.dtype_benchmark import build_filter, get_signals
+from source.filter_service import FilterClient, FilterService, start_server
+
+
+async def run_session(client_args, signal, chunk_size, latencies):
+    client = await FilterClient.connect(**client_args)
+    session_id = await client.open_session('default')
+    outputs = list()
+    for start in range(0, len(signal), chunk_size):
+        sent = time.perf_counter()
+        outputs.append(await client.process(session_id, signal[start:start + chunk_size]))
+        latencies.append(time.perf_counter() - sent)
+    await client.close_session(session_id)
+    await client.close()
+    return np.concatenate(outputs)
+
+
+async def generate_load(client_args, signals, chunk_size):
+    latencies = list()
+    start = time.perf_counter()
+    outputs = await asyncio.gather(*[run_session(client_args, signal, chunk_size, latencies) for signal in signals])
+    elapsed = time.perf_counter() - start
+    return outputs, elapsed, np.array(latencies) * 1000
+
+
+async def run_local(signals, chunk_size, max_batch_size, batch_delay):
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, 'filter.sock')
+        service = FilterService({'default': build_filter('float64')}, batch_delay, max_batch_size)
+        server = await start_server(service, socket_path)
+        try:
+            result = await generate_load({'socket_path': socket_path}, signals, chunk_size)
+        finally:
+            service.stop()
+            server.close()
+            await server.wait_closed()
+    return result + (service.stats.get_report(),)
+
+
+def main(sessions, points, chunk_size, batch_delay):
+    _, noised_y = get_signals('float64', points * sessions)
+    signals = np.split(noised_y, sessions)
+    rows = list()
+    for max_batch_size in [1, sessions]:
+        outputs, elapsed, latencies, stats = asyncio.run(run_local(signals, chunk_size, max_batch_size, batch_delay))
+        error = max(np.max(np.abs(output - build_filter('float64').predict(signal)))
+                    for output, signal in zip(outputs, signals))
+        rows.append([max_batch_size, f'{stats["mean_batch_size"]:.1f}', f'{sessions * points / elapsed:.0f}',
+                     *[f'{value:.2f}' for value in np.percentile(latencies, [50, 95, 99])], f'{error:.1e}'])
+    print_table(['max batch', 'mean batch', 'samples/s', 'p50, ms', 'p95, ms', 'p99, ms', 'max error'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load generator for the local filtering service.')
+    parser.add_argument('--sessions', type=int, default=32)
+    parser.add_argument('--points', type=int, default=20_000, help='samples per session')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--batch-delay', type=float, default=0.001, help='batch collection window, s')
+    arguments = parser.parse_args()
+    main(arguments.sessions, arguments.points, arguments.chunk_size, arguments.batch_delay)
@@ -0,0 +1,38 @@
+import argparse
+import numpy as np
+from benchmarks.benchmark_utils import measure, print_table
+from benchmarks.dtype_benchmark import build_filter, get_error, get_signals
+from source.filter_logic import FilterBuilder
+
+
+def build_sparse_filter(taps, active_taps, sparse_density):
+    filter = build_filter('float64', in_taps=taps, out_taps=0)
+    builder = FilterBuilder()
+    active = set(np.linspace(0, taps - 1, active_taps).astype(int).tolist())
+    for weight_index in range(taps):
+        if weight_index not in active:
+            builder.change_weight_status(filter, weight_index, 'in')
+    filter.sparse_density = sparse_density
+    return filter
+
+
+def main(n_points, taps_list, active_taps):
+    clean_y, noised_y = get_signals('float64', n_points)
+    rows = list()
+    for taps in taps_list:
+        dense_filter = build_sparse_filter(taps, active_taps, -1)
+        sparse_filter = build_sparse_filter(taps, active_taps, 1)
+        dense_time, dense_y = measure(lambda: dense_filter.train(clean_y, noised_y), 1)
+        sparse_time, sparse_y = measure(lambda: sparse_filter.train(clean_y, noised_y), 1)
+        rows.append([taps, active_taps, f'{dense_time * 1000:.1f}', f'{sparse_time * 1000:.1f}',
+                     f'{dense_time / sparse_time:.1f}x', f'{get_error(dense_y, sparse_y)[0]:.1e}'])
+    print_table(['taps', 'active', 'dense, ms', 'sparse, ms', 'speedup', 'max error'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare dense and sparse-tap training of mostly-disabled filters.')
+    parser.add_argument('--points', type=int, default=20_000)
+    parser.add_argument('--taps', type=int, nargs='+', default=[16, 64, 256, 1024, 4096])
+    parser.add_argument('--active', type=int, default=4)
+    arguments = parser.parse_args()
+    main(arguments.points, arguments.taps, arguments.active)
@@ -0,0 +1,59 @@
+import argparse
+import numpy as np
+from benchmarks.benchmark_utils import measure, print_table
+from benchmarks.dtype_benchmark import build_filter
+from source.signal_logic import SignalProcessor
+from source.subband_logic import SubbandAdaptiveFilter
+
+
+def get_signals(n_points, seed=0):
+    processor = SignalProcessor()
+    x, clean_y = processor.get_empty(0, 20, n_points)
+    for frequency, amplitude in [(0.5, 1.0), (3, 0.5), (11, 0.3), (40, 0.2)]:
+        clean_y = processor.add_sine(x, clean_y, frequency=frequency, amplitude=amplitude)
+    noised_y = processor.add_noise(x, clean_y, amplitude=0.4, rng=seed)
+    return clean_y, noised_y
+
+
+def get_segment_snr(clean_y, filtered_y, segments):
+    snr = list()
+    for clean_segment, filtered_segment in zip(np.array_split(clean_y, segments), np.array_split(filtered_y, segments)):
+        noise_power = np.mean((filtered_segment - clean_segment) ** 2)
+        snr.append(10 * np.log10(np.mean(clean_segment ** 2) / noise_power) if noise_power else np.inf)
+    return snr
+
+
+def main(n_points, taps, bands_list, learning_rate, segments):
+    clean_y, noised_y = get_signals(n_points)
+    rows = list()
+
+    def add_row(name, elapsed, filtered_y, delay):
+        aligned = filtered_y[delay:]
+        snr = get_segment_snr(clean_y[:len(aligned)], aligned, segments)
+        rows.append([name, f'{elapsed * 1000:.1f}', f'{n_points / elapsed:.0f}', *[f'{value:.1f}' for value in snr]])
+
+    full_filter = build_filter('float64', in_taps=taps, out_taps=0)
+    full_filter.n = learning_rate
+    elapsed, filtered_y = measure(lambda: full_filter.train(clean_y, noised_y), 1)
+    add_row(f'full band, {taps} taps', elapsed, filtered_y, 0)
+
+    for bands in bands_list:
+        band_filter = build_filter('float64', in_taps=max(taps // bands, 1), out_taps=0)
+        band_filter.n = learning_rate
+        subband_filter = SubbandAdaptiveFilter(band_filter, bands)
+        elapsed, filtered_y = measure(lambda: subband_filter.train(clean_y, noised_y), 1)
+        add_row(f'{bands} bands, {max(taps // bands, 1)} taps', elapsed, filtered_y, subband_filter.delay)
+
+    header = ['mode', 'train, ms', 'samples/s'] + [f'SNR {index + 1}/{segments}, dB' for index in range(segments)]
+    print_table(header, rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare full-band and sub-band adaptive filtering.')
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--taps', type=int, default=32)
+    parser.add_argument('--bands', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--learning-rate', type=float, default=0.005)
+    parser.add_argument('--segments', type=int, default=4)
+    arguments = parser.parse_args()
+    main(arguments.points, arguments.taps, arguments.bands, arguments.learning_rate, arguments.segments)
@@ -0,0 +1,41 @@
+import argparse
+import copy
+from benchmarks.benchmark_utils import measure, print_table
+from benchmarks.dtype_benchmark import build_filter, get_signals
+from benchmarks.subband_benchmark import get_segment_snr
+from source.wiener_logic import solve_filter, WIENER_REFINE_SCALE
+
+
+def train_epochs(filter, clean_y, noised_y, epoch_n):
+    for _ in range(epoch_n):
+        filter.train(clean_y, noised_y)
+    return filter
+
+
+def solve_and_train(filter, clean_y, noised_y, epoch_n):
+    filter = solve_filter(filter, clean_y, noised_y)
+    learning_rate, filter.n = filter.n, filter.n * WIENER_REFINE_SCALE
+    train_epochs(filter, clean_y, noised_y, epoch_n)
+    filter.n = learning_rate
+    return filter
+
+
+def main(n_points, taps, epochs_list):
+    clean_y, noised_y = get_signals('float64', n_points)
+    rows = list()
+    for name, function, epochs_values in [('LMS', train_epochs, epochs_list), ('solve + LMS', solve_and_train, [0, 1])]:
+        for epoch_n in epochs_values:
+            template = build_filter('float64', in_taps=taps, out_taps=0)
+            elapsed, filter = measure(lambda: function(copy.deepcopy(template), clean_y, noised_y, epoch_n), 1)
+            snr = get_segment_snr(clean_y, filter.predict(noised_y), 1)[0]
+            rows.append([name, epoch_n, f'{elapsed * 1000:.1f}', f'{snr:.2f}'])
+    print_table(['method', 'epochs', 'time, ms', 'SNR, dB'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare LMS epochs with the Wiener solution for the input taps.')
+    parser.add_argument('--points', type=int, default=50_000)
+    parser.add_argument('--taps', type=int, default=32)
+    parser.add_argument('--epochs', type=int, nargs='+', default=[1, 5, 20])
+    arguments = parser.parse_args()
+    main(arguments.points, arguments.taps, arguments.epochs)
@@ -0,0 +1,30 @@
+import importlib
+
+
+LAZY_ATTRIBUTES = {
+    'Filter': 'source.filter_logic',
+    'FilterBuilder': 'source.filter_logic',
+    'FilterDirector': 'source.filter_logic',
+    'SignalCollection': 'source.signal_logic',
+    'SignalProcessor': 'source.signal_logic',
+    'LazySignal': 'source.signal_logic',
+    'FilterManager': 'source.filter_manager',
+    'DivergenceGuard': 'source.stability_logic',
+    'FilterDivergenceError': 'source.stability_logic',
+    'save_filter': 'source.filter_io',
+    'load_filter': 'source.filter_io',
+    'get_snr': 'source.analysis_utils',
+    'get_normalized_snr': 'source.analysis_utils',
+}
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(LAZY_ATTRIBUTES))
@@ -1,5 +1,5 @@
 import numpy as np
-from source.signal_logic import SignalCollection
+from source.random_policy import resolve_rng
 
 
 def get_snr(clean_signal, noised_signal):
@@ -27,17 +27,103 @@ def get_normalized_snr(clean_signal, noised_signal, splits=1):
         snr_list.append(get_snr(normalized_clean, normalized_noised))
     return snr_list
 
-def get_af_characteristics(filter):
+def get_snr_db(clean_signal, filtered_signals, starts=None):
+    # Clean signal power over residual noise power in dB, along the last axis, for every
+    # row of filtered_signals; with starts, for every segment beginning at those indices.
+    # NaN (a diverged filter) scores -inf.
+    clean_signal = np.asarray(clean_signal, dtype=np.float64)
+    noise = np.asarray(filtered_signals, dtype=np.float64) - clean_signal
+    if starts is None:
+        signal_power, noise_power = np.sum(clean_signal ** 2, axis=-1), np.sum(noise ** 2, axis=-1)
+    else:
+        signal_power = np.add.reduceat(clean_signal ** 2, starts, axis=-1)
+        noise_power = np.add.reduceat(noise ** 2, starts, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        snr = 10 * np.log10(signal_power / noise_power)
+    return np.where(np.isnan(snr), -np.inf, snr)
+
+AF_FREQUENCIES = range(1, 25000, 200)
+IMPULSE_LENGTH = 50
+IMPULSE_MIN_LENGTH = 16
+IMPULSE_MAX_LENGTH = 4096
+IMPULSE_ENERGY_THRESHOLD = 1e-8
+
+
+def get_af_characteristics(filter, progress_callback=None, frequencies=AF_FREQUENCIES, rng=None):
+    from source.signal_logic import SignalCollection
+    rng = resolve_rng(rng)
     first_amplitude_list = list()
-    for frequency in range(1, 25000, 200):
-        _, _, noised_y = SignalCollection.sine(frequency/1000)
+    for frequency_index, frequency in enumerate(frequencies):
+        _, _, noised_y = SignalCollection.sine(frequency/1000, rng=rng)
         predict_filtered = filter.predict(noised_y)
         square_sum = sum([value ** 2 for value in predict_filtered])
         first_amplitude_list.append((square_sum/len(predict_filtered)) ** .5)
+        if progress_callback:
+            progress_callback(frequency_index + 1, len(frequencies))
     return first_amplitude_list
 
-def get_impulse_characteristics(filter):
-    impulse = [0] * 50
+def get_enabled_coefficients(filter, group):
+    group_slice = filter.get_group_slice(group)
+    return np.where(filter.statuses[group_slice], filter.coefficients[group_slice], 0).astype(np.float64)
+
+
+def get_feedback_response(feedback, min_length=IMPULSE_MIN_LENGTH, max_length=IMPULSE_MAX_LENGTH,
+                          threshold=IMPULSE_ENERGY_THRESHOLD):
+    # Power series of 1 / (1 - sum(feedback[j] * z^-(j+1))), doubled by Newton's iteration
+    # until the newest half carries a negligible share of the energy.
+    denominator = np.concatenate([[1.0], -feedback])
+    min_length = max(min_length, 2 * len(denominator))
+    response = np.ones(1)
+    with np.errstate(over='ignore', invalid='ignore'):
+        while len(response) < max_length:
+            length = min(2 * len(response), max_length)
+            correction = np.zeros(length)
+            product = np.convolve(denominator[:length], response)[:length]
+            correction[:len(product)] = -product
+            correction[0] += 2
+            half = len(response)
+            response = np.convolve(response, correction)[:length]
+            energy = np.sum(response ** 2)
+            if length >= min_length and np.isfinite(energy) and np.sum(response[half:] ** 2) <= threshold * energy:
+                break
+    return response
+
+
+def get_response_length(response, threshold=IMPULSE_ENERGY_THRESHOLD):
+    energy = np.cumsum(response ** 2)
+    if not np.isfinite(energy[-1]):
+        return len(response)
+    return int(np.searchsorted(energy, energy[-1] * (1 - threshold))) + 1
+
+
+def get_filter_response(filter, signal):
+    # Same response as predict() on a reset filter: the first sample is passed through
+    # and never enters the 'in' taps.
+    signal = np.asarray(signal, dtype=np.float64)
+    shifted = signal.copy()
+    shifted[:1] = 0
+    forcing = np.convolve(get_enabled_coefficients(filter, 'in'), shifted)[:len(signal)]
+    forcing[:1] = signal[:1]
+    feedback_response = get_feedback_response(get_enabled_coefficients(filter, 'out'), len(signal), len(signal))
+    with np.errstate(over='ignore', invalid='ignore'):
+        return np.convolve(feedback_response, forcing)[:len(signal)].astype(filter.dtype)
+
+
+def get_characteristic_length(filter, length=None):
+    if length is not None:
+        return length
+    response = get_feedback_response(get_enabled_coefficients(filter, 'out'))
+    return min(max(get_response_length(response), filter.group_sizes['in'] + 1), IMPULSE_MAX_LENGTH)
+
+
+def get_impulse_characteristics(filter, length=None):
+    length = get_characteristic_length(filter, length)
+    impulse = np.zeros(length)
     impulse[0] = 1
-    predict_filtered = filter.predict(impulse)
-    return predict_filtered, impulse
\ No newline at end of file
+    return get_filter_response(filter, impulse), impulse
+
+
+def get_step_characteristics(filter, length=None):
+    length = get_characteristic_length(filter, length)
+    step = np.ones(length)
+    return get_filter_response(filter, step), step
\ No newline at end of file
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def process_members(filter, coefficients, state, previous, noised_y, clean_y=None, step_scale=None):
+    noised_y = np.asarray(noised_y)
+    members, length = len(coefficients), noised_y.shape[-1]
+    outputs = np.empty((members, length), dtype=filter.dtype)
+    if length == 0:
+        return outputs, previous
+    first_step = 0
+    if previous is None:
+        outputs[:, 0] = noised_y[..., 0]
+        previous = outputs[:, 0].copy()
+        first_step = 1
+    in_size, out_size = filter.group_sizes['in'], filter.group_sizes['out']
+    accumulate = filter.accumulation_dtype != filter.dtype
+    masked = not np.all(filter.statuses)
+    mask = filter.statuses.astype(filter.dtype)
+    masked_state = np.empty_like(state) if masked else state
+    update = np.empty_like(state)
+    output = np.empty((members, 1, 1), dtype=filter.accumulation_dtype)
+    error = np.empty(members, dtype=filter.dtype)
+    # Batched (members x 1 x taps) @ (members x taps x 1) views over the same buffers.
+    coefficient_rows, state_columns = coefficients[:, None, :], masked_state[:, :, None]
+    noised_columns = np.ascontiguousarray(np.moveaxis(noised_y, -1, 0))
+    clean_columns = None if clean_y is None else np.ascontiguousarray(np.moveaxis(np.asarray(clean_y), -1, 0))
+    for step in range(first_step, length):
+        if in_size:
+            state[:, 1:in_size] = state[:, :in_size - 1]
+            state[:, 0] = noised_columns[step]
+        if out_size:
+            state[:, in_size + 1:] = state[:, in_size:-1]
+            state[:, in_size] = previous
+        if masked:
+            np.multiply(state, mask, out=masked_state)
+        if accumulate:
+            np.matmul(coefficient_rows.astype(filter.accumulation_dtype),
+                      state_columns.astype(filter.accumulation_dtype), out=output)
+        else:
+            np.matmul(coefficient_rows, state_columns, out=output)
+        outputs[:, step] = output[:, 0, 0]
+        if out_size:
+            previous = outputs[:, step].copy()
+        if clean_columns is not None:
+            np.subtract(output[:, 0, 0], clean_columns[step], out=error, casting='unsafe')
+            error *= filter.dtype.type(filter.n)
+            if step_scale is not None:
+                error *= step_scale
+            np.multiply(masked_state, error[:, None], out=update)
+            coefficients -= update
+            filter.n *= filter.learning_rate_decay
+    return outputs, outputs[:, -1].copy()
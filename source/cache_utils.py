@@ -0,0 +1,70 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def get_value_size(value):
+    if isinstance(value, (tuple, list)) and not np.isscalar(value):
+        return sum(get_value_size(item) for item in value)
+    return np.asarray(value).nbytes
+
+
+def get_weights_fingerprint(filter):
+    digest = hashlib.sha1(f'{filter.dtype}/{filter.accumulation_dtype}'.encode())
+    for group in ['in', 'out']:
+        group_slice = filter.get_group_slice(group)
+        enabled = np.flatnonzero(filter.statuses[group_slice])
+        digest.update(group.encode())
+        digest.update(enabled.tobytes())
+        digest.update(filter.coefficients[group_slice][enabled].tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_entries=128, max_bytes=32 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        size = get_value_size(value)
+        with self._lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def get_or_compute(self, key, function):
+        value = self.get(key, self)
+        if value is self:
+            value = function()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
@@ -0,0 +1,31 @@
+import os
+import numpy as np
+
+
+class DTypePolicy:
+    def __init__(self, dtype=np.float64, accumulation_dtype=None):
+        self.set(dtype, accumulation_dtype)
+
+    def set(self, dtype, accumulation_dtype=None):
+        self.dtype = np.dtype(dtype)
+        self.accumulation_dtype = np.dtype(accumulation_dtype) if accumulation_dtype is not None else None
+
+
+default_policy = DTypePolicy(os.environ.get('DIGITAFI_DTYPE', 'float64'),
+                             os.environ.get('DIGITAFI_ACCUMULATION_DTYPE'))
+
+
+def set_default_dtype(dtype, accumulation_dtype=None):
+    default_policy.set(dtype, accumulation_dtype)
+
+
+def resolve_dtype(dtype=None):
+    return np.dtype(dtype) if dtype is not None else default_policy.dtype
+
+
+def resolve_accumulation_dtype(accumulation_dtype=None, dtype=None):
+    if accumulation_dtype is not None:
+        return np.dtype(accumulation_dtype)
+    if default_policy.accumulation_dtype is not None:
+        return default_policy.accumulation_dtype
+    return resolve_dtype(dtype)
@@ -0,0 +1,90 @@
+import copy
+import multiprocessing
+import numpy as np
+from source.analysis_utils import get_snr_db
+from source.batch_logic import process_members
+from source.profiling_utils import profiled
+from source.random_policy import spawn_rngs
+from source.shared_signals import SharedSignalRegistry, attach_signals
+
+
+ENSEMBLE_MODES = ['batch', 'processes']
+COMBINE_MODES = ['best', 'average']
+
+
+class EnsembleResult:
+    def __init__(self, filter, scores, member_coefficients, best_index, combine):
+        self.filter = filter
+        self.scores = scores
+        self.member_coefficients = member_coefficients
+        self.best_index = best_index
+        self.combine = combine
+
+
+def get_member_coefficients(filter, members, seed):
+    return np.stack([rng.random(len(filter.coefficients)).astype(filter.dtype) for rng in spawn_rngs(seed, members)])
+
+
+@profiled('ensemble.train_batch')
+def train_batch(filter, coefficients, clean_y, noised_y, train_end, epoch_n):
+    coefficients = coefficients.copy()
+    state = np.repeat(filter.state[None, :], len(coefficients), axis=0)
+    previous = None
+    with np.errstate(over='ignore', invalid='ignore'):
+        for _ in range(epoch_n):
+            _, previous = process_members(filter, coefficients, state, None, noised_y[:train_end], clean_y[:train_end])
+        validation, _ = process_members(filter, coefficients, state, previous, noised_y[train_end:])
+    return coefficients, get_snr_db(clean_y[train_end:], validation)
+
+
+def train_member(filter, coefficients, descriptors, train_end, epoch_n):
+    filter = copy.deepcopy(filter)
+    filter.coefficients = coefficients.copy()
+    with attach_signals(descriptors) as signals, np.errstate(over='ignore', invalid='ignore'):
+        clean_y, noised_y = signals['clean_signal'], signals['noised_signal']
+        for _ in range(epoch_n):
+            filter.train(clean_y[:train_end], noised_y[:train_end])
+        validation = filter.process_block(noised_y[train_end:])
+        score = float(get_snr_db(clean_y[train_end:], validation))
+    return filter.coefficients, score, filter.n
+
+
+@profiled('ensemble.train_processes')
+def train_processes(filter, coefficients, clean_y, noised_y, train_end, epoch_n, processes=None):
+    with SharedSignalRegistry() as registry:
+        registry.publish('clean_signal', clean_y)
+        registry.publish('noised_signal', noised_y)
+        descriptors = registry.get_descriptors()
+        arguments = [(filter, member_coefficients, descriptors, train_end, epoch_n) for member_coefficients in coefficients]
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            results = pool.starmap(train_member, arguments)
+    filter.n = results[0][2]
+    return np.stack([result[0] for result in results]), np.array([result[1] for result in results])
+
+
+@profiled('ensemble.train_ensemble')
+def train_ensemble(filter, clean_y, noised_y, members=8, seed=0, epoch_n=1, validation_fraction=0.2,
+                   combine='best', mode='batch', processes=None):
+    if mode not in ENSEMBLE_MODES:
+        raise ValueError(f'Unknown ensemble mode: {mode}')
+    if combine not in COMBINE_MODES:
+        raise ValueError(f'Unknown ensemble combination: {combine}')
+    if members < 1:
+        raise ValueError('Ensemble needs at least one member')
+    clean_y, noised_y = np.asarray(clean_y, dtype=filter.dtype), np.asarray(noised_y, dtype=filter.dtype)
+    train_end = len(clean_y) - int(len(clean_y) * validation_fraction)
+    if train_end <= 0 or train_end >= len(clean_y):
+        raise ValueError('Validation fraction leaves no training or validation samples')
+    filter = copy.deepcopy(filter)
+    filter.reset_state()
+    initial_coefficients = get_member_coefficients(filter, members, seed)
+    if mode == 'batch':
+        coefficients, scores = train_batch(filter, initial_coefficients, clean_y, noised_y, train_end, epoch_n)
+    else:
+        coefficients, scores = train_processes(filter, initial_coefficients, clean_y, noised_y, train_end, epoch_n, processes)
+    best_index = int(np.argmax(scores))
+    if combine == 'best':
+        filter.coefficients = coefficients[best_index].copy()
+    else:
+        filter.coefficients = np.mean(coefficients, axis=0).astype(filter.dtype)
+    return EnsembleResult(filter, scores.tolist(), coefficients, best_index, combine)
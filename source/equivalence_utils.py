@@ -0,0 +1,264 @@
+import functools
+import random
+import sys
+import numpy as np
+from source.filter_logic import FilterBuilder, FirstDegreeFilter, SecondDegreeFilter
+from source.analysis_utils import (
+    get_af_characteristics, get_impulse_characteristics, get_step_characteristics, IMPULSE_LENGTH
+)
+from source.reference_logic import (
+    ReferenceFilter, ReferenceFirstDegreeFilter, ReferenceSecondDegreeFilter,
+    reference_af_characteristics, reference_impulse_characteristics, reference_step_characteristics
+)
+from source.subband_logic import SubbandAdaptiveFilter
+
+
+FILTER_ENGINES = dict()
+DIGITAL_FILTER_ENGINES = dict()
+CHARACTERISTIC_ENGINES = dict()
+
+
+class EquivalenceError(AssertionError):
+    def __init__(self, engine_name, stage, trial_seed, sample_index, reference_value, candidate_value):
+        self.engine_name = engine_name
+        self.stage = stage
+        self.trial_seed = trial_seed
+        self.sample_index = sample_index
+        self.reference_value = reference_value
+        self.candidate_value = candidate_value
+        message = (f'Engine "{engine_name}" diverged from the reference in {stage} '
+                   f'at sample {sample_index} (trial seed {trial_seed}): '
+                   f'reference={reference_value!r}, candidate={candidate_value!r}')
+        super().__init__(message)
+
+
+def register_filter_engine(name, factory, rtol=1e-9, atol=1e-12):
+    FILTER_ENGINES[name] = (factory, rtol, atol)
+
+
+def register_digital_filter_engine(name, reference_class, factory, rtol=1e-9, atol=1e-12):
+    DIGITAL_FILTER_ENGINES[name] = (reference_class, factory, rtol, atol)
+
+
+def register_characteristic_engine(name, reference_function, function, rtol=1e-9, atol=1e-12):
+    CHARACTERISTIC_ENGINES[name] = (reference_function, function, rtol, atol)
+
+
+def generate_topology(rng, max_taps=6):
+    topology = {'learning_rate': float(rng.uniform(0.001, 0.05)), 'weights': dict()}
+    for group in ['in', 'out']:
+        tap_n = int(rng.integers(0 if group == 'out' else 1, max_taps + 1))
+        values = rng.uniform(0.05, 1, tap_n) * rng.choice([-1, 1], tap_n)
+        if group == 'out' and tap_n:
+            values *= rng.uniform(0.1, 0.9) / np.sum(np.abs(values))
+        statuses = rng.random(tap_n) > 0.3
+        topology['weights'][group] = [{'status': bool(status), 'value': float(value)}
+                                      for status, value in zip(statuses, values)]
+    return topology
+
+
+def generate_signals(rng, n_points=400):
+    x = np.linspace(0, 20, n_points)
+    clean_y = np.zeros(n_points)
+    for _ in range(int(rng.integers(1, 4))):
+        clean_y += rng.uniform(0.1, 1) * np.sin(x * rng.uniform(0.1, 5) + rng.uniform(0, np.pi))
+    noised_y = clean_y + rng.uniform(0, 0.5) * (rng.random(n_points) * 2 - 1)
+    return x, clean_y, noised_y
+
+
+def build_reference_filter(topology):
+    filter = ReferenceFilter(topology['learning_rate'])
+    for group in ['in', 'out']:
+        filter.weights[group] = [dict(weight) for weight in topology['weights'][group]]
+        filter.input_values[group] = [0] * len(topology['weights'][group])
+    return filter
+
+
+def build_filter(topology, dtype=None, accumulation_dtype=None):
+    builder = FilterBuilder()
+    filter = builder.get_new_filter(topology['learning_rate'], dtype, accumulation_dtype)
+    for group in ['in', 'out']:
+        for weight_index, weight in enumerate(topology['weights'][group]):
+            builder.add_weight(filter, group, weight['value'])
+            if not weight['status']:
+                builder.change_weight_status(filter, weight_index, group)
+    return filter
+
+
+def build_sparse_filter(topology):
+    filter = build_filter(topology)
+    filter.sparse_density = 1.0
+    return filter
+
+
+def get_weight_vector(weights):
+    return [weight['value'] for group in ['in', 'out'] for weight in weights[group]]
+
+
+def find_first_divergence(reference, candidate, rtol, atol):
+    reference = np.asarray(reference, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    common_length = min(len(reference), len(candidate))
+    close = np.isclose(candidate[:common_length], reference[:common_length],
+                       rtol=rtol, atol=atol, equal_nan=True)
+    diverging = np.flatnonzero(~close)
+    if len(diverging):
+        return int(diverging[0])
+    if len(reference) != len(candidate):
+        return common_length
+    return None
+
+
+def assert_equivalent(engine_name, stage, trial_seed, reference, candidate, rtol, atol):
+    sample_index = find_first_divergence(reference, candidate, rtol, atol)
+    if sample_index is None:
+        return
+    reference_value = float(reference[sample_index]) if sample_index < len(reference) else None
+    candidate_value = float(candidate[sample_index]) if sample_index < len(candidate) else None
+    raise EquivalenceError(engine_name, stage, trial_seed, sample_index, reference_value, candidate_value)
+
+
+def check_filter_engine(name, trials=20, seed=0, n_points=400):
+    factory, rtol, atol = FILTER_ENGINES[name]
+    for trial_seed in np.random.SeedSequence(seed).generate_state(trials):
+        rng = np.random.default_rng(trial_seed)
+        topology = generate_topology(rng)
+        _, clean_y, noised_y = generate_signals(rng, n_points)
+        _, _, predict_y = generate_signals(rng, n_points)
+        reference_filter = build_reference_filter(topology)
+        candidate_filter = factory(topology)
+
+        reference_output = reference_filter.train(clean_y, noised_y)
+        candidate_output = candidate_filter.train(clean_y, noised_y)
+        assert_equivalent(name, 'train output', trial_seed, reference_output, candidate_output, rtol, atol)
+        assert_equivalent(name, 'trained weights', trial_seed,
+                          get_weight_vector(reference_filter.weights),
+                          get_weight_vector(candidate_filter.weights), rtol, atol)
+
+        reference_output = reference_filter.predict(predict_y)
+        candidate_output = candidate_filter.predict(predict_y)
+        assert_equivalent(name, 'predict output', trial_seed, reference_output, candidate_output, rtol, atol)
+    return trials
+
+
+def check_digital_filter_engine(name, trials=5, seed=0, n_points=400):
+    reference_class, factory, rtol, atol = DIGITAL_FILTER_ENGINES[name]
+    for trial_seed in np.random.SeedSequence(seed).generate_state(trials):
+        rng = np.random.default_rng(trial_seed)
+        _, clean_y, noised_y = generate_signals(rng, n_points)
+        _, _, predict_y = generate_signals(rng, n_points)
+        reference_filter = reference_class()
+        candidate_filter = factory()
+
+        with np.errstate(over='ignore', invalid='ignore'):
+            reference_output = reference_filter.train(clean_y, noised_y)
+            candidate_output = candidate_filter.train(clean_y, noised_y)
+            assert_equivalent(name, 'train output', trial_seed, reference_output, candidate_output, rtol, atol)
+            assert_equivalent(name, 'trained weights', trial_seed,
+                              reference_filter.w, candidate_filter.w, rtol, atol)
+
+            reference_output = reference_filter.predict(predict_y)
+            candidate_output = candidate_filter.predict(predict_y)
+            assert_equivalent(name, 'predict output', trial_seed, reference_output, candidate_output, rtol, atol)
+
+            edited_value = float(rng.uniform(-1, 1))
+            reference_filter.w[0] = edited_value
+            candidate_filter.w[0] = edited_value
+            reference_output = reference_filter.predict(predict_y)
+            candidate_output = candidate_filter.predict(predict_y)
+            assert_equivalent(name, 'predict output after editing w', trial_seed,
+                              reference_output, candidate_output, rtol, atol)
+
+            assigned_weights = rng.uniform(-0.5, 0.5, len(reference_filter.w)).tolist()
+            reference_filter.w = list(assigned_weights)
+            candidate_filter.w = assigned_weights
+            reference_output = reference_filter.predict(predict_y)
+            candidate_output = candidate_filter.predict(predict_y)
+            assert_equivalent(name, 'predict output after assigning w', trial_seed,
+                              reference_output, candidate_output, rtol, atol)
+    return trials
+
+
+def get_mirrored_rng():
+    # A generator on the random module's current Mersenne Twister state: it draws the
+    # same doubles as random.random(), so the candidate sees the reference's noise.
+    _, state, _ = random.getstate()
+    bit_generator = np.random.MT19937()
+    bit_generator.state = {'bit_generator': 'MT19937',
+                           'state': {'key': np.array(state[:-1], dtype=np.uint32), 'pos': state[-1]}}
+    return np.random.Generator(bit_generator)
+
+
+def get_mirrored_af_characteristics(filter):
+    return get_af_characteristics(filter, rng=get_mirrored_rng())
+
+
+def check_characteristic_engine(name, trials=2, seed=0):
+    reference_function, function, rtol, atol = CHARACTERISTIC_ENGINES[name]
+    for trial_seed in np.random.SeedSequence(seed).generate_state(trials):
+        rng = np.random.default_rng(trial_seed)
+        topology = generate_topology(rng)
+        random.seed(int(trial_seed))
+        reference_result = reference_function(build_reference_filter(topology))
+        random.seed(int(trial_seed))
+        candidate_result = function(build_filter(topology))
+        if isinstance(reference_result, tuple):
+            reference_result, candidate_result = reference_result[0], candidate_result[0]
+        assert_equivalent(name, 'characteristic', trial_seed, reference_result, candidate_result, rtol, atol)
+    return trials
+
+
+def check_subband_modes(name, trials=2, seed=0, n_points=2000, blocks=4, bands=4, rtol=1e-9, atol=1e-12):
+    # Processes mode has no reference implementation; it must match the batch mode.
+    for trial_seed in np.random.SeedSequence(seed).generate_state(trials):
+        rng = np.random.default_rng(trial_seed)
+        filter = build_filter(generate_topology(rng))
+        _, clean_y, noised_y = generate_signals(rng, n_points)
+        outputs = list()
+        for mode in ['batch', 'processes']:
+            with SubbandAdaptiveFilter(filter, bands, mode=mode) as subband_filter:
+                train_y = [subband_filter.process_block(noised_block, clean_block) for noised_block, clean_block
+                           in zip(np.array_split(noised_y, blocks), np.array_split(clean_y, blocks))]
+                outputs.append((np.concatenate(train_y), subband_filter.predict(noised_y)))
+        (batch_train, batch_predict), (candidate_train, candidate_predict) = outputs
+        assert_equivalent(name, 'train output', trial_seed, batch_train, candidate_train, rtol, atol)
+        assert_equivalent(name, 'predict output', trial_seed, batch_predict, candidate_predict, rtol, atol)
+    return trials
+
+
+def run_check(check, name, **kwargs):
+    try:
+        check(name, **kwargs)
+    except EquivalenceError as error:
+        return name, error
+    return name, None
+
+
+def check_all_engines(trials=20, seed=0):
+    report = [run_check(check_filter_engine, name, trials=trials, seed=seed) for name in FILTER_ENGINES]
+    report += [run_check(check_digital_filter_engine, name, seed=seed) for name in DIGITAL_FILTER_ENGINES]
+    report += [run_check(check_characteristic_engine, name, seed=seed) for name in CHARACTERISTIC_ENGINES]
+    report.append(run_check(check_subband_modes, 'subband_processes', seed=seed))
+    return report
+
+
+register_filter_engine('filter', build_filter)
+register_filter_engine('filter_float32', functools.partial(build_filter, dtype='float32'), rtol=1e-4, atol=1e-5)
+register_filter_engine('filter_float32_float64_accumulation',
+                       functools.partial(build_filter, dtype='float32', accumulation_dtype='float64'), rtol=1e-4, atol=1e-5)
+register_filter_engine('filter_sparse', build_sparse_filter)
+register_digital_filter_engine('first_degree', ReferenceFirstDegreeFilter, FirstDegreeFilter)
+register_digital_filter_engine('second_degree', ReferenceSecondDegreeFilter, SecondDegreeFilter)
+register_characteristic_engine('af_characteristics', reference_af_characteristics, get_mirrored_af_characteristics)
+register_characteristic_engine('impulse_characteristics', reference_impulse_characteristics,
+                               functools.partial(get_impulse_characteristics, length=IMPULSE_LENGTH))
+register_characteristic_engine('step_characteristics', reference_step_characteristics,
+                               functools.partial(get_step_characteristics, length=IMPULSE_LENGTH))
+
+
+if __name__ == '__main__':
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    report = check_all_engines(trials)
+    for name, error in report:
+        print(f'{name}: {"OK" if error is None else error}')
+    sys.exit(any(error is not None for _, error in report))
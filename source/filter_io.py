@@ -0,0 +1,122 @@
+import json
+import mmap
+import os
+import struct
+import zipfile
+import numpy as np
+from source.filter_logic import Filter
+from source.io_utils import read_filter_file, write_filter_file
+from source.profiling_utils import profiled
+
+
+CHECKPOINT_SCHEMA_VERSION = 2
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+def get_filter_arrays(filter):
+    metadata = {
+        'schema_version': CHECKPOINT_SCHEMA_VERSION,
+        'learning_rate': float(filter.n),
+        'learning_rate_decay': float(filter.learning_rate_decay),
+        'dtype': str(filter.dtype),
+        'accumulation_dtype': str(filter.accumulation_dtype),
+        'groups': list(filter._weight_group_list),
+        'group_sizes': [filter.group_sizes[group] for group in filter._weight_group_list],
+    }
+    arrays = {'coefficients': filter.coefficients, 'statuses': filter.statuses, 'state': filter.state}
+    if filter.previous_output is not None:
+        arrays['previous_output'] = np.array([filter.previous_output], dtype=filter.dtype)
+    return metadata, arrays
+
+
+def get_filter_from_arrays(metadata, arrays):
+    if metadata.get('schema_version', 0) > CHECKPOINT_SCHEMA_VERSION:
+        raise ValueError(f'Unsupported filter checkpoint version: {metadata["schema_version"]}')
+    filter = Filter(metadata['learning_rate'], metadata['dtype'], metadata['accumulation_dtype'])
+    filter.learning_rate_decay = metadata.get('learning_rate_decay', 1.0)
+    filter._weight_group_list = list(metadata['groups'])
+    filter.group_sizes = dict(zip(metadata['groups'], metadata['group_sizes']))
+    filter.coefficients = arrays['coefficients']
+    filter.statuses = arrays['statuses']
+    filter.state = arrays['state']
+    if 'previous_output' in arrays:
+        filter.previous_output = arrays['previous_output'][0]
+    return filter
+
+
+def write_checkpoint(file_name, metadata, arrays):
+    temporary_name = f'{file_name}.tmp'
+    with open(temporary_name, 'wb') as f:
+        np.savez(f, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(temporary_name, file_name)
+
+
+def read_stored_array(buffer, offset):
+    buffer.seek(offset)
+    version = np.lib.format.read_magic(buffer)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(buffer)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(buffer)
+    count = int(np.prod(shape))
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=buffer.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+@profiled('io.read_checkpoint')
+def read_checkpoint(file_name, mapped=False):
+    arrays = dict()
+    with open(file_name, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    with zipfile.ZipFile(file_name) as archive:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            header = buffer[info.header_offset:info.header_offset + ZIP_LOCAL_HEADER_SIZE]
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            data_offset = info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length
+            arrays[name] = read_stored_array(buffer, data_offset)
+    metadata = json.loads(str(arrays.pop('metadata')))
+    if not mapped:
+        # Owned, aligned copies, and the mapping is closed: checkpoints are saved back to
+        # the same path, and Windows cannot replace a file that is still mapped.
+        arrays = {name: np.array(array, copy=True) for name, array in arrays.items()}
+        buffer.close()
+    return metadata, arrays
+
+
+@profiled('io.save_filter_checkpoint')
+def save_filter_checkpoint(file_name, filter, metadata=None, arrays=None):
+    filter_metadata, filter_arrays = get_filter_arrays(filter)
+    filter_metadata.update(metadata or dict())
+    filter_arrays.update(arrays or dict())
+    write_checkpoint(file_name, filter_metadata, filter_arrays)
+
+
+@profiled('io.load_filter_checkpoint')
+def load_filter_checkpoint(file_name):
+    metadata, arrays = read_checkpoint(file_name)
+    return get_filter_from_arrays(metadata, arrays)
+
+
+def is_json_file(file_name):
+    return os.path.splitext(file_name)[1].lower() == '.json'
+
+
+def save_filter(file_name, filter):
+    if is_json_file(file_name):
+        write_filter_file(file_name, filter.weights)
+    else:
+        save_filter_checkpoint(file_name, filter)
+
+
+def load_filter(file_name, filter=None):
+    if not is_json_file(file_name):
+        return load_filter_checkpoint(file_name)
+    if filter is None:
+        filter = Filter()
+    filter.weights = read_filter_file(file_name)
+    return filter
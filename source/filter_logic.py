@@ -1,180 +1,388 @@
 import numpy as np
-import random
+from source.dtype_policy import resolve_dtype, resolve_accumulation_dtype
+from source.random_policy import resolve_rng
+
+
+PROGRESS_INTERVAL = 1000
+SPARSE_DENSITY = 0.25
+SPARSE_CHUNK_VALUES = 2**18
+FILTER_PRESETS = {
+    'first_degree': {'in': 1, 'out': 1},
+    'second_degree': {'in': 1, 'out': 2},
+}
 
 
 class Filter:
-    def __init__(self, learning_rate=0.2):
+    def __init__(self, learning_rate=0.2, dtype=None, accumulation_dtype=None):
+        self.dtype = resolve_dtype(dtype)
+        self.accumulation_dtype = resolve_accumulation_dtype(accumulation_dtype, self.dtype)
         self.reset()
         self.n = learning_rate
+        self.learning_rate_decay = 1.0
+        self.sparse_density = SPARSE_DENSITY
 
     def reset(self):
         self._weight_group_list = ['in', 'out']
-        self.weights = {group : list() for group in self._weight_group_list}
-        self.input_values = {group : list() for group in self._weight_group_list}
+        self.group_sizes = {group : 0 for group in self._weight_group_list}
+        self.coefficients = np.zeros(0, dtype=self.dtype)
+        self.statuses = np.zeros(0, dtype=bool)
+        self.state = np.zeros(0, dtype=self.dtype)
+        self.previous_output = None
+
+    @property
+    def statuses(self):
+        return self._statuses
+
+    @statuses.setter
+    def statuses(self, statuses):
+        self._statuses = np.asarray(statuses, dtype=bool)
+        self.active_positions = np.flatnonzero(self._statuses)
 
-    def reset_weights(self):
+    def is_sparse(self):
+        return len(self.active_positions) <= self.sparse_density * len(self.coefficients)
+
+    def get_group_slice(self, group):
+        start = 0
+        for current_group in self._weight_group_list:
+            if current_group == group:
+                return slice(start, start + self.group_sizes[group])
+            start += self.group_sizes[current_group]
+        raise KeyError(group)
+
+    def get_weight_position(self, group, weight_index):
+        return self.get_group_slice(group).start + range(self.group_sizes[group])[weight_index]
+
+    @property
+    def weights(self):
+        weights = dict()
         for group in self._weight_group_list:
-            for value_index, _ in enumerate(self.weights[group]):
-                self.weights[group][value_index] = random.random()
+            group_slice = self.get_group_slice(group)
+            weights[group] = [{'status': bool(status), 'value': float(value)}
+                              for status, value in zip(self.statuses[group_slice], self.coefficients[group_slice])]
+        return weights
+
+    @weights.setter
+    def weights(self, weights):
+        values, statuses = list(), list()
+        for group in self._weight_group_list:
+            for weight in weights[group]:
+                if isinstance(weight, dict):
+                    values.append(weight['value'])
+                    statuses.append(weight['status'])
+                else:
+                    values.append(weight)
+                    statuses.append(True)
+            self.group_sizes[group] = len(weights[group])
+        self.coefficients = np.array(values, dtype=self.dtype)
+        self.statuses = np.array(statuses, dtype=bool)
+        self.state = np.zeros(len(values), dtype=self.dtype)
+
+    @property
+    def input_values(self):
+        return {group : self.state[self.get_group_slice(group)].tolist() for group in self._weight_group_list}
+
+    @input_values.setter
+    def input_values(self, input_values):
+        self.state = np.concatenate([np.asarray(input_values[group], dtype=self.dtype)
+                                     for group in self._weight_group_list])
+
+    def set_dtype(self, dtype, accumulation_dtype=None):
+        self.dtype = resolve_dtype(dtype)
+        self.accumulation_dtype = resolve_accumulation_dtype(accumulation_dtype, self.dtype)
+        self.coefficients = self.coefficients.astype(self.dtype)
+        self.state = self.state.astype(self.dtype)
+        if self.previous_output is not None:
+            self.previous_output = self.dtype.type(self.previous_output)
+
+    def insert_weight(self, group, value, status=True):
+        position = self.get_group_slice(group).stop
+        self.coefficients = np.insert(self.coefficients, position, value)
+        self._statuses = np.insert(self._statuses, position, status)
+        self.state = np.insert(self.state, position, 0)
+        self.group_sizes[group] += 1
+        active_positions = self.active_positions + (self.active_positions >= position)
+        if status:
+            active_positions = np.insert(active_positions, np.searchsorted(active_positions, position), position)
+        self.active_positions = active_positions
+
+    def delete_weight(self, group, weight_index):
+        position = self.get_weight_position(group, weight_index)
+        self.coefficients = np.delete(self.coefficients, position)
+        self._statuses = np.delete(self._statuses, position)
+        self.state = np.delete(self.state, position)
+        self.group_sizes[group] -= 1
+        active_positions = self.active_positions[self.active_positions != position]
+        self.active_positions = active_positions - (active_positions > position)
+
+    def switch_weight_status(self, group, weight_index):
+        position = self.get_weight_position(group, weight_index)
+        self._statuses[position] = not self._statuses[position]
+        index = np.searchsorted(self.active_positions, position)
+        if self._statuses[position]:
+            self.active_positions = np.insert(self.active_positions, index, position)
+        else:
+            self.active_positions = np.delete(self.active_positions, index)
+
+    def reset_state(self):
+        self.state[:] = 0
+        self.previous_output = None
+
+    def reset_weights(self, rng=None):
+        self.coefficients[:] = resolve_rng(rng).random(len(self.coefficients))
 
     def info(self):
-        info = f'This filter has {len(self.weights["in"])} input weights and {len(self.weights["out"])} output weights.'
+        info = f'This filter has {self.group_sizes["in"]} input weights and {self.group_sizes["out"]} output weights.'
         return info
     
     def update_weights(self, error):
-        for group in self._weight_group_list:
-            for value_index, value in enumerate(self.input_values[group]):
-                if self.weights[group][value_index]['status'] == False:
-                    continue
-                self.weights[group][value_index]['value'] -= self.n * error * value
+        active = self.active_positions
+        self.coefficients[active] -= self.dtype.type(self.n * error) * self.state[active]
 
     def get_output(self):
-        sum_value = 0
-        for group in self._weight_group_list:
-            for value_index, value in enumerate(self.input_values[group]):
-                if self.weights[group][value_index]['status'] == False:
-                    continue
-                sum_value += self.weights[group][value_index]['value'] * value
-        return sum_value
+        active = self.active_positions
+        coefficients, state = self.coefficients[active], self.state[active]
+        if self.accumulation_dtype != self.dtype:
+            return np.dot(coefficients.astype(self.accumulation_dtype), state.astype(self.accumulation_dtype))
+        return np.dot(coefficients, state)
     
+    def shift_state(self, current_noised, current_filtered):
+        in_size, out_size = self.group_sizes['in'], self.group_sizes['out']
+        if in_size:
+            self.state[1:in_size] = self.state[:in_size - 1]
+            self.state[0] = current_noised
+        if out_size:
+            self.state[in_size + 1:] = self.state[in_size:-1]
+            self.state[in_size] = current_filtered
+
     def make_step(self, current_noised, current_filtered):
-        self.input_values['in'].insert(0, current_noised)
-        self.input_values['in'].pop()
-        self.input_values['out'].insert(0, current_filtered)
-        self.input_values['out'].pop()
+        self.shift_state(current_noised, current_filtered)
         return self.get_output()
 
-    def train(self, clean_y, noised_y):
-        filtered_sequence = noised_y[:1]
-        learning_rate = self.n
-        step = 1
-        while step < len(clean_y):
-            output = self.make_step(noised_y[step], filtered_sequence[-1])
-            filtered_sequence = np.append(filtered_sequence, output)
-            error = output - clean_y[step]
-            self.update_weights(error)
-            step += 1
-            learning_rate *= 0.99
-        return filtered_sequence 
+    def start_stream(self):
+        self.previous_output = None
+
+    def process_block(self, noised_y, clean_y=None, progress_callback=None):
+        length = len(noised_y) if clean_y is None else len(clean_y)
+        filtered_sequence = np.empty(length, dtype=self.dtype)
+        if length == 0:
+            return filtered_sequence
+        if self.is_sparse():
+            return self.process_sparse_block(noised_y, clean_y, progress_callback, filtered_sequence)
+        first_step = 0
+        if self.previous_output is None:
+            filtered_sequence[0] = noised_y[0]
+            first_step = 1
+        previous_output = filtered_sequence[0] if first_step else self.previous_output
+        coefficients, state = self.coefficients, self.state
+        mask = self.statuses.astype(self.dtype)
+        masked_state = np.empty_like(state)
+        accumulate = self.accumulation_dtype != self.dtype
+        decaying = self.learning_rate_decay != 1.0
+        value_type = self.dtype.type
+        for step in range(first_step, length):
+            self.shift_state(noised_y[step], previous_output)
+            np.multiply(state, mask, out=masked_state)
+            if accumulate:
+                output = np.dot(coefficients.astype(self.accumulation_dtype), masked_state.astype(self.accumulation_dtype))
+            else:
+                output = np.dot(coefficients, masked_state)
+            filtered_sequence[step] = output
+            previous_output = filtered_sequence[step]
+            if clean_y is not None:
+                error = output - clean_y[step]
+                masked_state *= value_type(self.n * error)
+                coefficients -= masked_state
+                if decaying:
+                    self.n *= self.learning_rate_decay
+            if progress_callback and (step + 1) % PROGRESS_INTERVAL == 0:
+                progress_callback(step + 1, length)
+        self.previous_output = previous_output
+        return filtered_sequence
+
+    def process_sparse_block(self, noised_y, clean_y, progress_callback, filtered_sequence):
+        length = len(filtered_sequence)
+        in_size, out_size = self.group_sizes['in'], self.group_sizes['out']
+        first_step = 0
+        if self.previous_output is None:
+            filtered_sequence[0] = noised_y[0]
+            first_step = 1
+        previous_output = filtered_sequence[0] if first_step else self.previous_output
+        active = self.active_positions
+        active_in = active[active < in_size]
+        out_columns = [(tap + 1, column) for column, tap in enumerate(active[len(active_in):] - in_size, len(active_in))]
+        in_offsets = in_size - active_in
+        coefficients = self.coefficients[active]
+        # Each row of `values` holds the active taps of one step. The 'in' columns are gathered
+        # for the whole chunk at once; an output is written into the 'out' columns of the rows
+        # that will see it, so a step only touches the active taps.
+        in_history = self.state[:in_size][::-1].copy()
+        out_history = np.append(self.state[in_size:][::-1], previous_output if out_size else 0).astype(self.dtype)
+        chunk_size = max(SPARSE_CHUNK_VALUES // max(len(active), 1), 1)
+        accumulation_dtype = self.accumulation_dtype if self.accumulation_dtype != self.dtype else None
+        value_type = self.dtype.type
+        decaying = self.learning_rate_decay != 1.0
+        for chunk_start in range(first_step, length, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, length)
+            rows = chunk_stop - chunk_start
+            inputs = np.concatenate([in_history, np.asarray(noised_y[chunk_start:chunk_stop], dtype=self.dtype)])
+            values = np.empty((rows, len(active)), dtype=self.dtype)
+            values[:, :len(active_in)] = inputs[in_offsets + np.arange(rows)[:, None]]
+            for row_offset, column in out_columns:
+                history_rows = min(row_offset, rows)
+                values[:history_rows, column] = out_history[out_size + 1 - row_offset:out_size + 1 - row_offset + history_rows]
+            for index in range(rows):
+                step = chunk_start + index
+                step_values = values[index]
+                if accumulation_dtype:
+                    output = np.dot(coefficients.astype(accumulation_dtype), step_values.astype(accumulation_dtype))
+                else:
+                    output = np.dot(coefficients, step_values)
+                filtered_sequence[step] = output
+                for row_offset, column in out_columns:
+                    if index + row_offset < rows:
+                        values[index + row_offset, column] = output
+                if clean_y is not None:
+                    step_values *= value_type(self.n * (output - clean_y[step]))
+                    coefficients -= step_values
+                    if decaying:
+                        self.n *= self.learning_rate_decay
+                if progress_callback and (step + 1) % PROGRESS_INTERVAL == 0:
+                    progress_callback(step + 1, length)
+            in_history = inputs[len(inputs) - in_size:]
+            out_history = np.concatenate([out_history, filtered_sequence[chunk_start:chunk_stop]])[rows:]
+        self.coefficients[active] = coefficients
+        self.state[:in_size] = in_history[::-1]
+        self.state[in_size:] = out_history[:out_size][::-1]
+        self.previous_output = filtered_sequence[length - 1] if length > first_step else previous_output
+        return filtered_sequence
+
+    def train(self, clean_y, noised_y, progress_callback=None, guard=None):
+        self.start_stream()
+        if guard is not None:
+            return guard.process(self, noised_y, clean_y, progress_callback)
+        return self.process_block(noised_y, clean_y, progress_callback)
     
-    def predict(self, noised_y):
-        filtered_sequence = noised_y[:1]
-        step = 1
-        while step < len(noised_y):
-            output = self.make_step(noised_y[step], filtered_sequence[-1])
-            filtered_sequence = np.append(filtered_sequence, output)
-            step += 1
-        return filtered_sequence 
+    def predict(self, noised_y, progress_callback=None, guard=None):
+        self.start_stream()
+        if guard is not None:
+            return guard.process(self, noised_y, None, progress_callback)
+        return self.process_block(noised_y, None, progress_callback)
 
 
 class FilterBuilder:
-    def __init__(self):
-        pass
+    def __init__(self, rng=None):
+        # Seeds are turned into a generator once, so that successive weights differ;
+        # None keeps following the default generator.
+        self.rng = None if rng is None else resolve_rng(rng)
 
-    def get_new_filter(self, learning_rate=0.2):
-        return Filter(learning_rate)
+    def get_new_filter(self, learning_rate=0.2, dtype=None, accumulation_dtype=None):
+        return Filter(learning_rate, dtype, accumulation_dtype)
 
     def add_weight(self, filter: Filter, group, initial_value=0):
         if initial_value:
             add_value = initial_value
         else:
-            add_value = random.random()
-        filter.weights[group].append({'status': True, 'value': add_value})
-        filter.input_values[group].append(0)
+            add_value = resolve_rng(self.rng).random()
+        filter.insert_weight(group, add_value)
         return filter
 
     def remove_weight(self, filter: Filter, weight_index, group):
-        filter.weights[group].pop(weight_index)
-        filter.input_values[group].pop(weight_index)
+        filter.delete_weight(group, weight_index)
         return filter
 
     def change_weight_status(self, filter: Filter, weight_index, group):
-        filter.weights[group][weight_index]['status'] = not filter.weights[group][weight_index]['status']
+        filter.switch_weight_status(group, weight_index)
 
 
 class FilterDirector:
     def __init__(self):
         self.builder = FilterBuilder()
 
-    def get_first_degree_filter(self):
+    def get_preset_filter(self, preset):
         filter = self.builder.get_new_filter()
-        self.builder.add_weight(filter, 'in')
-        self.builder.add_weight(filter, 'out')
+        for group, tap_n in FILTER_PRESETS[preset].items():
+            for _ in range(tap_n):
+                self.builder.add_weight(filter, group)
         return filter
 
+    def get_first_degree_filter(self):
+        return self.get_preset_filter('first_degree')
+
     def get_second_degree_filter(self):
-        filter = self.builder.get_new_filter()
-        self.builder.add_weight(filter, 'in')
-        self.builder.add_weight(filter, 'out')
-        self.builder.add_weight(filter, 'out')
-        return filter
+        return self.get_preset_filter('second_degree')
     
 
 class DigitalFilter:
+    preset = None
+
+    def __init__(self, delta_t=1*10**-4):
+        self.delta_t = delta_t
+        self.step = 1
+        self.engine = Filter(learning_rate=0.4)
+        self.engine.learning_rate_decay = 0.99
+        weight_n = sum(FILTER_PRESETS[self.preset].values())
+        for group, tap_n in FILTER_PRESETS[self.preset].items():
+            for _ in range(tap_n):
+                self.engine.insert_weight(group, 1/weight_n)
+
+    @property
+    def n(self):
+        return self.engine.n
+
+    @n.setter
+    def n(self, learning_rate):
+        self.engine.n = learning_rate
+
+    @property
+    def w(self):
+        # The coefficients array itself, so that item assignments such as w[0] = x
+        # reach the engine.
+        return self.engine.coefficients
+
+    @w.setter
+    def w(self, weights):
+        weights = np.asarray(weights, dtype=self.engine.dtype)
+        if weights.shape != self.engine.coefficients.shape:
+            raise ValueError(f'{type(self).__name__} has {len(self.engine.coefficients)} weights, got {weights.shape}')
+        self.engine.coefficients[:] = weights
+
+    @property
+    def history_length(self):
+        return FILTER_PRESETS[self.preset]['out']
+
     def update_weights(self, error, input):
-        for i in range(len(self.w)):
-            self.w[i] -= self.n * error * input[i]
+        self.engine.coefficients -= self.n * error * np.asarray(input, dtype=self.engine.dtype)
 
     def get_output(self, input):
-        y = 0
-        for i in range(len(self.w)):
-            y += self.w[i] * input[i]
-        return y
+        return np.dot(self.engine.coefficients, np.asarray(input, dtype=self.engine.dtype))
 
+    def start_history(self, sequence):
+        history = np.asarray(sequence[:self.history_length], dtype=self.engine.dtype)
+        self.engine.reset_state()
+        out_slice = self.engine.get_group_slice('out')
+        self.engine.state[out_slice.start:out_slice.start + len(history) - 1] = history[-2::-1]
+        self.engine.previous_output = history[-1]
+        return history
 
-class FirstDegreeFilter(DigitalFilter):
-    def __init__(self, delta_t=1*10**-4):
-        self.delta_t = delta_t
-        self.n = 0.4
-        self.step = 1
-        self.w = [1/2 for _ in range(2)]
+    def run(self, sequence, start, clean_signal=None):
+        if len(sequence) < self.history_length:
+            return np.array(sequence[:self.history_length])
+        history = self.start_history(sequence)
+        clean_block = None if clean_signal is None else clean_signal[start:]
+        return np.concatenate([history, self.engine.process_block(sequence[start:], clean_block)])
 
     def train(self, clean_signal, sequence):
-        filtered_sequence = sequence[:1]
-        self.step = 1
-        while self.step < len(clean_signal):
-            input = [sequence[self.step], filtered_sequence[-1]]
-            output = self.get_output(input)
-            filtered_sequence = np.append(filtered_sequence, output)
-            error = output - clean_signal[self.step]
-            self.update_weights(error, input)
-            self.step += 1
-            self.n *= 0.99
+        filtered_sequence = self.run(sequence, 1, clean_signal)
+        self.step = max(len(clean_signal), 1)
         return filtered_sequence
 
     def predict(self, sequence):
-        filtered_sequence = sequence[:1]
-        for x in sequence[1:]:
-            input = [x, filtered_sequence[-1]]
-            output = self.get_output(input)
-            filtered_sequence = np.append(filtered_sequence, output)
-        return filtered_sequence
+        return self.run(sequence, self.history_length)
 
 
-class SecondDegreeFilter(DigitalFilter):
-    def __init__(self, delta_t=1*10**-4):
-        self.delta_t = delta_t
-        self.n = 0.4
-        self.step = 1
-        self.w = [1/3 for _ in range(3)]
+class FirstDegreeFilter(DigitalFilter):
+    preset = 'first_degree'
 
-    def train(self, clean_signal, sequence):
-        filtered_sequence = sequence[:2]
-        self.step = 1
-        while self.step < len(clean_signal):
-            input = [sequence[self.step], filtered_sequence[-1], filtered_sequence[-2]]
-            output = self.get_output(input)
-            filtered_sequence = np.append(filtered_sequence, output)
-            error = output - clean_signal[self.step]
-            self.update_weights(error, input)
-            self.step += 1
-            self.n *= 0.99
-        return filtered_sequence
 
-    def predict(self, sequence):
-        filtered_sequence = sequence[:2]
-        for x in sequence[2:]:
-            input = [x, filtered_sequence[-1], filtered_sequence[-2]]
-            output = self.get_output(input)
-            filtered_sequence = np.append(filtered_sequence, output)
-        return filtered_sequence
\ No newline at end of file
+class SecondDegreeFilter(DigitalFilter):
+    preset = 'second_degree'
@@ -0,0 +1,269 @@
+import copy
+import numpy as np
+from source.filter_logic import FilterBuilder
+from source.signal_logic import SignalProcessor, LazySignal
+from source.analysis_utils import (
+    get_normalized_snr, get_impulse_characteristics, get_step_characteristics, get_af_characteristics, AF_FREQUENCIES,
+    IMPULSE_ENERGY_THRESHOLD, IMPULSE_MAX_LENGTH
+)
+from source.cache_utils import LRUCache, get_weights_fingerprint
+from source.profiling_utils import profiled, count_signal_space, count_result
+from source.random_policy import resolve_rng
+from source.plot_utils import MinMaxPyramid
+from source.stability_logic import DivergenceGuard
+
+
+class TrackedSignal:
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, manager, owner=None):
+        if manager is None:
+            return self
+        value = manager.__dict__[self.name]
+        if isinstance(value, LazySignal):
+            return value.materialize()
+        return value
+
+    def __set__(self, manager, value):
+        manager.__dict__[self.name] = value
+        manager.mark_signal_changed(self.name)
+
+
+class FilterManager:
+    signal_space = TrackedSignal()
+    clean_signal = TrackedSignal()
+    noised_signal = TrackedSignal()
+    filtered_signal = TrackedSignal()
+    shared_signal_names = ['signal_space', 'clean_signal', 'noised_signal']
+
+    def __init__(self, rng=None):
+        self.rng = resolve_rng(rng)
+        # The AFC runs on a worker thread, so it gets a child seed of its own rather than
+        # drawing from self.rng in an order that depends on timing. Every AFC starts
+        # that stream afresh, so the same weights always get the same noise.
+        self.afc_seed = self.rng.bit_generator.seed_seq.spawn(1)[0]
+        self.filter_builder = FilterBuilder(self.rng)
+        self.signal_processor = SignalProcessor()
+        self.signal_versions = dict()
+        self.pyramid_cache = dict()
+        self.characteristics_cache = LRUCache()
+        self.shared_signals = None
+        self.divergence_guard = DivergenceGuard()
+        self.reset()
+
+    def mark_signal_changed(self, name):
+        self.signal_versions[name] = self.signal_versions.get(name, 0) + 1
+        self.pyramid_cache.pop(name, None)
+        if name == 'signal_space':
+            self.pyramid_cache.clear()
+
+    def get_signal_model(self, name):
+        value = self.__dict__[name]
+        if not isinstance(value, LazySignal):
+            value = LazySignal(self.signal_space, value)
+            self.__dict__[name] = value
+        return value
+
+    def get_signals_snapshot(self):
+        return np.array(self.clean_signal), np.array(self.noised_signal)
+
+    @profiled('FilterManager.publish_signals', samples=count_signal_space)
+    def publish_signals(self, names=None):
+        if self.shared_signals is None:
+            from source.shared_signals import SharedSignalRegistry
+            self.shared_signals = SharedSignalRegistry()
+        names = self.shared_signal_names if names is None else names
+        for name in names:
+            self.shared_signals.publish(name, getattr(self, name), self.signal_versions[name])
+        return self.shared_signals.get_descriptors(names)
+
+    def close_shared_signals(self):
+        if self.shared_signals is not None:
+            self.shared_signals.close()
+            self.shared_signals = None
+
+    def get_signal_pyramid(self, name):
+        if name not in self.pyramid_cache:
+            self.pyramid_cache[name] = MinMaxPyramid(self.signal_space, getattr(self, name))
+        return self.pyramid_cache[name]
+        
+    @profiled('FilterManager.reset', samples=count_signal_space)
+    def reset(self):
+        self.filter = self.filter_builder.get_new_filter()
+        self.signal_space = self.signal_processor.get_signal_space()
+        self.clean_signal = LazySignal(self.signal_space)
+        self.noised_signal = LazySignal(self.signal_space)
+        self.filtered_signal = LazySignal(self.signal_space)
+
+    @profiled('FilterManager.filter_train', samples=count_signal_space)
+    def filter_train(self):
+        self.filtered_signal = self.filter.train(self.clean_signal, self.noised_signal)
+
+    @profiled('FilterManager.filter_inference', samples=count_signal_space)
+    def filter_inference(self):
+        self.filtered_signal = self.filter.predict(self.noised_signal)
+
+    def get_filter_snapshot(self):
+        return copy.deepcopy(self.filter)
+
+    def apply_filter_result(self, filter, filtered_signal):
+        self.filter = filter
+        if filtered_signal is not None:
+            self.filtered_signal = filtered_signal
+
+    @profiled('FilterManager.train_snapshot', samples=count_signal_space)
+    def train_snapshot(self, filter, clean_signal, noised_signal, epoch_n, progress_callback=None):
+        total = epoch_n * len(clean_signal)
+        filtered_signal = None
+        for epoch in range(epoch_n):
+            sample_callback = None
+            if progress_callback:
+                offset = epoch * len(clean_signal)
+                sample_callback = lambda done, _: progress_callback(offset + done, total)
+            filtered_signal = filter.train(clean_signal, noised_signal, sample_callback, self.divergence_guard)
+            if progress_callback:
+                progress_callback((epoch + 1) * len(clean_signal), total, filtered_signal)
+        return filter, filtered_signal
+
+    @profiled('FilterManager.solve_snapshot', samples=count_signal_space)
+    def solve_snapshot(self, filter, clean_signal, noised_signal, epoch_n=0, progress_callback=None):
+        from source.wiener_logic import solve_filter, WIENER_REFINE_SCALE
+        solve_filter(filter, clean_signal, noised_signal)
+        if not epoch_n:
+            return self.predict_snapshot(filter, noised_signal, progress_callback)
+        learning_rate = filter.n
+        filter.n = refine_rate = learning_rate * WIENER_REFINE_SCALE
+        try:
+            return self.train_snapshot(filter, clean_signal, noised_signal, epoch_n, progress_callback)
+        finally:
+            # Decay and guard shrinking during the refinement carry over to the user's rate.
+            filter.n = learning_rate * filter.n / refine_rate if refine_rate else learning_rate
+
+    @profiled('FilterManager.predict_snapshot', samples=count_signal_space)
+    def predict_snapshot(self, filter, noised_signal, progress_callback=None):
+        return filter, filter.predict(noised_signal, progress_callback, self.divergence_guard)
+
+    @profiled('FilterManager.train_ensemble', samples=count_signal_space)
+    def train_ensemble(self, members, seed, epoch_n=1, combine='best', mode='batch'):
+        from source.ensemble_logic import train_ensemble
+        result = train_ensemble(self.filter, self.clean_signal, self.noised_signal, members, seed, epoch_n,
+                                combine=combine, mode=mode)
+        self.filter = result.filter
+        return result
+
+    @profiled('FilterManager.cross_validate', samples=count_signal_space)
+    def cross_validate(self, folds=5, method='kfold', epoch_n=1, mode='processes', processes=None):
+        from source.validation_logic import cross_validate
+        descriptors = self.publish_signals(['clean_signal', 'noised_signal']) if mode == 'processes' else None
+        return cross_validate(self.filter, self.clean_signal, self.noised_signal, folds, method, epoch_n, mode, processes,
+                              descriptors)
+
+    def save_filter(self, file_name):
+        from source.filter_io import save_filter
+        save_filter(file_name, self.filter)
+
+    def load_filter(self, file_name):
+        from source.filter_io import load_filter
+        self.filter = load_filter(file_name, self.filter)
+
+    @profiled('FilterManager.reset_weights')
+    def reset_weights(self):
+        if self.filter == None:
+            return
+        self.filter.reset_weights(self.rng)
+
+    def switch_status_weight(self, weight_index, group):
+        self.filter_builder.change_weight_status(self.filter, weight_index, group)
+
+    def show_weights(self):
+        if self.filter == None:
+            return "Filter is not initialized"
+        message = f"""Input weights: {self.filter.weights['in']}
+Output weights: {self.filter.weights['out']}"""
+        return message
+    
+    def add_weight(self, group, value_to_add):
+        if self.filter == None:
+            return
+        self.filter = self.filter_builder.add_weight(self.filter, group, value_to_add)
+
+    def remove_weight(self, weight_index, group):
+        if self.filter == None:
+            return
+        self.filter = self.filter_builder.remove_weight(self.filter, weight_index, group)
+
+    def get_clean_copy(self, filter):
+        filter = copy.deepcopy(filter)
+        filter.reset_state()
+        return filter
+
+    @profiled('FilterManager.get_af_characteristics', samples=count_result)
+    def get_af_characteristics(self, filter=None, progress_callback=None):
+        filter = self.filter if filter is None else filter
+        key = ('afc', get_weights_fingerprint(filter), AF_FREQUENCIES)
+        return self.characteristics_cache.get_or_compute(
+            key, lambda: get_af_characteristics(self.get_clean_copy(filter), progress_callback, rng=self.afc_seed))
+
+    @profiled('FilterManager.get_impulse_characteristics')
+    def get_impulse_characteristics(self, filter=None):
+        filter = self.filter if filter is None else filter
+        key = ('impulse', get_weights_fingerprint(filter), IMPULSE_ENERGY_THRESHOLD, IMPULSE_MAX_LENGTH)
+        return self.characteristics_cache.get_or_compute(key, lambda: get_impulse_characteristics(filter))
+
+    @profiled('FilterManager.get_step_characteristics')
+    def get_step_characteristics(self, filter=None):
+        filter = self.filter if filter is None else filter
+        key = ('step', get_weights_fingerprint(filter), IMPULSE_ENERGY_THRESHOLD, IMPULSE_MAX_LENGTH)
+        return self.characteristics_cache.get_or_compute(key, lambda: get_step_characteristics(filter))
+
+    @profiled('FilterManager.get_filter_characteristics')
+    def get_filter_characteristics(self, filter, progress_callback=None):
+        amplitude_list = self.get_af_characteristics(filter, progress_callback)
+        predict_filtered, impulse = self.get_impulse_characteristics(filter)
+        return amplitude_list, predict_filtered, impulse
+
+    def get_cached_filter_characteristics(self):
+        fingerprint = get_weights_fingerprint(self.filter)
+        if ('afc', fingerprint, AF_FREQUENCIES) not in self.characteristics_cache:
+            return None
+        if ('impulse', fingerprint, IMPULSE_ENERGY_THRESHOLD, IMPULSE_MAX_LENGTH) not in self.characteristics_cache:
+            return None
+        return self.get_filter_characteristics(self.filter)
+
+    @profiled('FilterManager.get_snr', samples=count_signal_space)
+    def get_snr(self, splits):
+        key = ('snr', self.signal_versions['clean_signal'], self.signal_versions['noised_signal'], splits)
+        return self.characteristics_cache.get_or_compute(
+            key, lambda: get_normalized_snr(self.clean_signal, self.noised_signal, splits))
+
+    @profiled('FilterManager.reset_signal', samples=count_signal_space)
+    def reset_signal(self, apply_to_clean):
+        if apply_to_clean:
+            self.clean_signal = LazySignal(self.signal_space)
+        else:
+            self.noised_signal = LazySignal(self.signal_space)
+
+    @profiled('FilterManager.add_sine_signal', samples=count_signal_space)
+    def add_sine_signal(self, apply_to_clean, frequency, amplitude, phase, start, end):
+        name = 'clean_signal' if apply_to_clean else 'noised_signal'
+        self.get_signal_model(name).add_sine(frequency, amplitude, phase, start, end)
+        self.mark_signal_changed(name)
+
+    @profiled('FilterManager.add_line_signal', samples=count_signal_space)
+    def add_line_signal(self, apply_to_clean, angle, offset, start, end):
+        name = 'clean_signal' if apply_to_clean else 'noised_signal'
+        self.get_signal_model(name).add_linear(angle, offset, start, end)
+        self.mark_signal_changed(name)
+
+    @profiled('FilterManager.add_noise_signal', samples=count_signal_space)
+    def add_noise_signal(self, apply_to_clean, amplitude, start, end):
+        name = 'clean_signal' if apply_to_clean else 'noised_signal'
+        self.get_signal_model(name).add_noise(amplitude, start, end, self.rng)
+        self.mark_signal_changed(name)
+
+    @profiled('FilterManager.generate_signal_space', samples=count_signal_space)
+    def generate_signal_space(self, n_points, a, b):
+        self.signal_space = np.linspace(a, b, n_points)
+        self.clean_signal = LazySignal(self.signal_space)
+        self.noised_signal = LazySignal(self.signal_space)
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import struct
+import time
+import numpy as np
+from source.filter_io import load_filter
+from source.profiling_utils import profiled
+
+
+HEADER_FORMAT = '<II'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+LATENCY_WINDOW = 10000
+
+
+class FilterServiceError(Exception):
+    pass
+
+
+async def read_message(reader):
+    header_size, payload_size = struct.unpack(HEADER_FORMAT, await reader.readexactly(HEADER_SIZE))
+    # Both parts are read before parsing, so a malformed header still consumes its frame.
+    header = await reader.readexactly(header_size)
+    payload = await reader.readexactly(payload_size) if payload_size else b''
+    return json.loads(header), payload
+
+
+def write_message(writer, header, payload=b''):
+    header = json.dumps(header).encode()
+    writer.write(struct.pack(HEADER_FORMAT, len(header), len(payload)) + header + payload)
+
+
+def encode_chunk(chunk):
+    chunk = np.ascontiguousarray(chunk)
+    return {'dtype': str(chunk.dtype), 'length': len(chunk)}, chunk.tobytes()
+
+
+def decode_chunk(header, payload):
+    return np.frombuffer(payload, dtype=header['dtype'], count=header['length'])
+
+
+class ServiceStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.samples = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def add_batch(self, request_n, sample_n, latencies):
+        self.batches += 1
+        self.batched_requests += request_n
+        self.requests += request_n
+        self.samples += sample_n
+        self.latencies.extend(latencies)
+
+    def get_report(self):
+        elapsed = time.monotonic() - self.started
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [0.0, 0.0, 0.0]
+        return {
+            'uptime': elapsed,
+            'requests': self.requests,
+            'samples': self.samples,
+            'samples_per_second': self.samples / elapsed if elapsed else 0.0,
+            'batches': self.batches,
+            'mean_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+            'latency_ms': dict(zip(['p50', 'p95', 'p99'], map(float, percentiles))),
+        }
+
+
+class FilterSession:
+    def __init__(self, session_id, filter_name, filter):
+        self.session_id = session_id
+        self.filter_name = filter_name
+        self.state = np.zeros_like(filter.state)
+        self.previous_output = None
+
+
+@profiled('service.process_batch', samples=lambda result, filter, sessions, chunks: sum(map(len, chunks)))
+def process_batch(filter, sessions, chunks):
+    outputs = [np.empty(len(chunk), dtype=filter.dtype) for chunk in chunks]
+    offsets = np.zeros(len(chunks), dtype=int)
+    for index, (session, chunk) in enumerate(zip(sessions, chunks)):
+        if session.previous_output is None and len(chunk):
+            outputs[index][0] = chunk[0]
+            session.previous_output = outputs[index][0]
+            offsets[index] = 1
+    lengths = np.array([len(chunk) for chunk in chunks]) - offsets
+    order = np.argsort(-lengths, kind='stable')
+    sorted_lengths = lengths[order]
+    batch_size, max_length = len(order), int(sorted_lengths[0]) if len(order) else 0
+    inputs = np.zeros((batch_size, max_length), dtype=filter.dtype)
+    for row, index in enumerate(order):
+        inputs[row, :lengths[index]] = chunks[index][offsets[index]:]
+    state = np.stack([sessions[index].state for index in order])
+    previous = np.array([sessions[index].previous_output or 0 for index in order], dtype=filter.dtype)
+    results = np.empty((batch_size, max_length), dtype=filter.dtype)
+
+    coefficients = (filter.coefficients * filter.statuses).astype(filter.accumulation_dtype)
+    accumulate = filter.accumulation_dtype != filter.dtype
+    in_size, out_size = filter.group_sizes['in'], filter.group_sizes['out']
+    active_n = batch_size
+    for step in range(max_length):
+        while active_n and sorted_lengths[active_n - 1] <= step:
+            active_n -= 1
+        rows = state[:active_n]
+        if in_size:
+            rows[:, 1:in_size] = rows[:, :in_size - 1]
+            rows[:, 0] = inputs[:active_n, step]
+        if out_size:
+            rows[:, in_size + 1:] = rows[:, in_size:-1]
+            rows[:, in_size] = previous[:active_n]
+        results[:active_n, step] = (rows.astype(filter.accumulation_dtype) if accumulate else rows) @ coefficients
+        previous[:active_n] = results[:active_n, step]
+
+    for row, index in enumerate(order):
+        outputs[index][offsets[index]:] = results[row, :lengths[index]]
+        if lengths[index]:
+            sessions[index].state = state[row].copy()
+            sessions[index].previous_output = previous[row]
+    return outputs
+
+
+class FilterService:
+    def __init__(self, filters, batch_delay=0.001, max_batch_size=256):
+        self.filters = filters
+        self.batch_delay = batch_delay
+        self.max_batch_size = max_batch_size
+        self.sessions = dict()
+        self.queues = {name: asyncio.Queue() for name in filters}
+        self.stats = ServiceStats()
+        self._session_ids = itertools.count(1)
+        self._tasks = list()
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self.run_batcher(name)) for name in self.filters]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def open_session(self, filter_name):
+        if filter_name not in self.filters:
+            raise FilterServiceError(f'Unknown filter: {filter_name}')
+        session = FilterSession(next(self._session_ids), filter_name, self.filters[filter_name])
+        self.sessions[session.session_id] = session
+        return session
+
+    def get_session(self, session_id):
+        if session_id not in self.sessions:
+            raise FilterServiceError(f'Unknown session: {session_id}')
+        return self.sessions[session_id]
+
+    async def process(self, session_id, chunk):
+        session = self.get_session(session_id)
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[session.filter_name].put((session, chunk, future, time.monotonic()))
+        return await future
+
+    async def collect_batch(self, queue, deferred):
+        pending = deferred[:] if deferred else [await queue.get()]
+        deferred.clear()
+        deadline = time.monotonic() + self.batch_delay
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        while not queue.empty():
+            pending.append(queue.get_nowait())
+        batch, session_ids = list(), set()
+        for request in pending:
+            if request[0].session_id in session_ids or len(batch) >= self.max_batch_size:
+                deferred.append(request)
+            else:
+                session_ids.add(request[0].session_id)
+                batch.append(request)
+        return batch
+
+    async def run_batcher(self, filter_name):
+        queue, deferred, filter = self.queues[filter_name], list(), self.filters[filter_name]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect_batch(queue, deferred)
+            sessions, chunks = [request[0] for request in batch], [request[1] for request in batch]
+            try:
+                outputs = await loop.run_in_executor(None, process_batch, filter, sessions, chunks)
+            except Exception as error:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            now = time.monotonic()
+            self.stats.add_batch(len(batch), sum(map(len, chunks)), [now - request[3] for request in batch])
+            for (_, _, future, _), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    async def handle_request(self, header, payload):
+        if not isinstance(header, dict):
+            raise FilterServiceError('Request header must be a JSON object')
+        operation = header.get('operation')
+        if operation == 'open':
+            session = self.open_session(header['filter'])
+            return {'session': session.session_id}, b''
+        if operation == 'process':
+            session = self.get_session(header['session'])
+            chunk = decode_chunk(header, payload).astype(self.filters[session.filter_name].dtype, copy=False)
+            return encode_chunk(await self.process(session.session_id, chunk))
+        if operation == 'close':
+            self.sessions.pop(header['session'], None)
+            return {}, b''
+        if operation == 'filters':
+            return {'filters': sorted(self.filters)}, b''
+        if operation == 'stats':
+            return self.stats.get_report(), b''
+        raise FilterServiceError(f'Unknown operation: {operation}')
+
+    async def handle_connection(self, reader, writer):
+        opened = set()
+        try:
+            while True:
+                try:
+                    header, payload = await read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                except ValueError as error:
+                    write_message(writer, {'error': f'Malformed request header: {error}'})
+                    await writer.drain()
+                    continue
+                try:
+                    response, response_payload = await self.handle_request(header, payload)
+                except (FilterServiceError, KeyError, ValueError, TypeError) as error:
+                    response, response_payload = {'error': str(error)}, b''
+                if isinstance(header, dict) and header.get('operation') == 'open' and 'session' in response:
+                    opened.add(response['session'])
+                write_message(writer, response, response_payload)
+                await writer.drain()
+        finally:
+            for session_id in opened:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+
+async def start_server(service, socket_path=None, host='127.0.0.1', port=0):
+    service.start()
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+    return await asyncio.start_server(service.handle_connection, host, port)
+
+
+class FilterClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, socket_path=None, host='127.0.0.1', port=None):
+        if socket_path:
+            return cls(*await asyncio.open_unix_connection(socket_path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, header, payload=b''):
+        write_message(self.writer, header, payload)
+        await self.writer.drain()
+        response, response_payload = await read_message(self.reader)
+        if 'error' in response:
+            raise FilterServiceError(response['error'])
+        return response, response_payload
+
+    async def open_session(self, filter_name):
+        response, _ = await self.request({'operation': 'open', 'filter': filter_name})
+        return response['session']
+
+    async def process(self, session_id, chunk):
+        header, payload = encode_chunk(chunk)
+        response, response_payload = await self.request(dict(header, operation='process', session=session_id), payload)
+        return decode_chunk(response, response_payload)
+
+    async def close_session(self, session_id):
+        await self.request({'operation': 'close', 'session': session_id})
+
+    async def get_filters(self):
+        return (await self.request({'operation': 'filters'}))[0]['filters']
+
+    async def get_stats(self):
+        return (await self.request({'operation': 'stats'}))[0]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def load_filters(specifications):
+    filters = dict()
+    for specification in specifications:
+        name, _, file_name = specification.rpartition('=')
+        name = name or os.path.splitext(os.path.basename(file_name))[0]
+        filters[name] = load_filter(file_name)
+    return filters
+
+
+async def serve(arguments):
+    service = FilterService(load_filters(arguments.filters), arguments.batch_delay / 1000, arguments.max_batch_size)
+    server = await start_server(service, arguments.socket, arguments.host, arguments.port)
+    print(f'Serving {", ".join(sorted(service.filters))} on '
+          f'{arguments.socket or server.sockets[0].getsockname()}', flush=True)
+    async with server:
+        while True:
+            await asyncio.sleep(arguments.stats_interval)
+            print(json.dumps(service.stats.get_report()), flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local filtering service with micro-batching')
+    parser.add_argument('filters', nargs='+', help='filter files (.npz or .json), optionally as name=path')
+    parser.add_argument('--socket', help='Unix socket path (localhost TCP is used otherwise)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--batch-delay', type=float, default=1.0, help='batch collection window, ms')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--stats-interval', type=float, default=10.0)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
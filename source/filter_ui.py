@@ -32,6 +32,9 @@ class Ui_MainWindow(object):
         self.radioButton_inference = QtWidgets.QRadioButton(self.tab_main)
         self.radioButton_inference.setGeometry(QtCore.QRect(60, 70, 95, 20))
         self.radioButton_inference.setObjectName("radioButton_inference")
+        self.radioButton_solve = QtWidgets.QRadioButton(self.tab_main)
+        self.radioButton_solve.setGeometry(QtCore.QRect(60, 100, 95, 20))
+        self.radioButton_solve.setObjectName("radioButton_solve")
         self.pushButton_launch = QtWidgets.QPushButton(self.tab_main)
         self.pushButton_launch.setGeometry(QtCore.QRect(40, 280, 171, 51))
         self.pushButton_launch.setObjectName("pushButton_launch")
@@ -347,6 +350,7 @@ class Ui_MainWindow(object):
         self.label_mode.setText(_translate("MainWindow", "Режим фільтра"))
         self.radioButton_train.setText(_translate("MainWindow", "Тренування"))
         self.radioButton_inference.setText(_translate("MainWindow", "Робота"))
+        self.radioButton_solve.setText(_translate("MainWindow", "Розрахунок"))
         self.pushButton_launch.setText(_translate("MainWindow", "Пуск"))
         self.label_epoch.setText(_translate("MainWindow", "Кількість епох:"))
         self.label_learning_rate.setText(_translate("MainWindow", "Швидкість навчання:"))
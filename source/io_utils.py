@@ -0,0 +1,37 @@
+import json
+import numpy as np
+from source.dtype_policy import resolve_dtype
+from source.profiling_utils import profiled
+
+
+@profiled('io.read_signal_file', samples=lambda result, *args, **kwargs: len(result[1]))
+def read_signal_file(file_name, dtype=None):
+    data = np.loadtxt(file_name, delimiter='\t', usecols=(0, 1), ndmin=2)
+    return data[:, 0], data[:, 1].astype(resolve_dtype(dtype))
+
+
+@profiled('io.write_signal_file', samples=lambda result, file_name, signal, signal_space: len(signal))
+def write_signal_file(file_name, signal, signal_space):
+    with open(file_name, 'w') as f:
+        f.write('\n'.join([f'{str(signal_space[index])}\t{str(value)}' for index, value in enumerate(signal)]))
+
+
+@profiled('io.read_filter_file', samples=lambda result, *args, **kwargs: len(result['in']) + len(result['out']))
+def read_filter_file(file_name):
+    with open(file_name, 'r') as f:
+        filter_weights = json.load(f)
+    return filter_weights
+
+
+@profiled('io.write_filter_file')
+def write_filter_file(file_name, filter_weights):
+    with open(file_name, "w") as outfile:
+        json.dump(filter_weights, outfile)
+
+
+def open_signal_array(file_name, dtype=None):
+    if file_name.endswith('.npy'):
+        return np.load(file_name, mmap_mode='r')
+    if file_name.endswith('.txt'):
+        return read_signal_file(file_name, dtype)[1]
+    return np.memmap(file_name, dtype=resolve_dtype(dtype), mode='r')
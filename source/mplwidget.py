@@ -1,13 +1,62 @@
+import time
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
-from matplotlib.backends.backend_qt5agg  import FigureCanvas
+from matplotlib.backends.backend_qt5agg  import FigureCanvas, NavigationToolbar2QT
 from matplotlib.figure import Figure
 
     
 class MplWidget(QWidget):
-    def __init__(self, parent = None):
+    def __init__(self, parent = None, max_fps=10):
         QWidget.__init__(self, parent)
         self.canvas = FigureCanvas(Figure())
         vertical_layout = QVBoxLayout()
+        vertical_layout.addWidget(NavigationToolbar2QT(self.canvas, self))
         vertical_layout.addWidget(self.canvas)
         self.canvas.axes = self.canvas.figure.add_subplot(111)
-        self.setLayout(vertical_layout)
\ No newline at end of file
+        self.canvas.axes.grid()
+        self.canvas.axes.callbacks.connect('xlim_changed', self.update_lines_detail)
+        self.setLayout(vertical_layout)
+        self.lines = dict()
+        self.pyramids = dict()
+        self.draw_interval = 1 / max_fps
+        self.last_draw_time = 0
+        self.draw_timer = QTimer(self)
+        self.draw_timer.setSingleShot(True)
+        self.draw_timer.timeout.connect(self.draw)
+
+    def get_plot_width(self):
+        return self.canvas.get_width_height()[0]
+
+    def get_line_data(self, name):
+        x_start, x_end = None, None
+        if not self.canvas.axes.get_autoscalex_on():
+            x_start, x_end = self.canvas.axes.get_xlim()
+        return self.pyramids[name].get_view(x_start, x_end, self.get_plot_width())
+
+    def set_line(self, name, pyramid, **style):
+        self.pyramids[name] = pyramid
+        x, y = self.get_line_data(name)
+        if name in self.lines:
+            self.lines[name].set_data(x, y)
+        else:
+            self.lines[name], = self.canvas.axes.plot(x, y, **style)
+
+    def update_lines_detail(self, axes):
+        for name, line in self.lines.items():
+            line.set_data(*self.get_line_data(name))
+        self.request_draw()
+
+    def refresh(self):
+        self.canvas.axes.relim()
+        self.canvas.axes.autoscale_view()
+        self.request_draw()
+
+    def request_draw(self):
+        if self.draw_timer.isActive():
+            return
+        delay = self.draw_interval - (time.monotonic() - self.last_draw_time)
+        self.draw_timer.start(max(0, int(delay * 1000)))
+
+    def draw(self):
+        self.last_draw_time = time.monotonic()
+        self.canvas.draw_idle()
@@ -0,0 +1,183 @@
+import copy
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from source.dtype_policy import resolve_dtype
+from source.profiling_utils import profiled
+
+
+TAPS_PER_PHASE = 8
+
+
+def design_lowpass(factor, taps_per_phase=TAPS_PER_PHASE):
+    length = factor * taps_per_phase
+    n = np.arange(length) - (length - 1) / 2
+    taps = np.sinc(n / factor) * np.hamming(length)
+    return taps / np.sum(taps)
+
+
+def is_uniform(signal_space, rtol=1e-6):
+    steps = np.diff(np.asarray(signal_space, dtype=np.float64))
+    if len(steps) < 2:
+        return True
+    return bool(np.allclose(steps, steps[0], rtol=rtol, atol=0))
+
+
+def resample_uniform(signal_space, signal):
+    signal_space = np.asarray(signal_space, dtype=np.float64)
+    uniform_space = np.linspace(signal_space[0], signal_space[-1], len(signal_space))
+    return uniform_space, np.interp(uniform_space, signal_space, signal).astype(np.asarray(signal).dtype)
+
+
+def get_positions(signal_space, indices):
+    signal_space = np.asarray(signal_space, dtype=np.float64)
+    if len(signal_space) < 2:
+        return np.full(len(indices), signal_space[0] if len(signal_space) else 0.0)
+    positions = np.interp(indices, np.arange(len(signal_space)), signal_space)
+    before, after = indices < 0, indices > len(signal_space) - 1
+    positions[before] = signal_space[0] + indices[before] * (signal_space[1] - signal_space[0])
+    positions[after] = signal_space[-1] + (indices[after] - len(signal_space) + 1) * (signal_space[-1] - signal_space[-2])
+    return positions
+
+
+class PolyphaseDecimator:
+    def __init__(self, factor, taps=None, dtype=None):
+        self.factor = factor
+        self.dtype = resolve_dtype(dtype)
+        self.taps = np.asarray(design_lowpass(factor) if taps is None else taps, dtype=self.dtype)
+        self.reset()
+
+    def reset(self):
+        self.history = np.zeros(len(self.taps) - 1, dtype=self.dtype)
+        self.position = 0
+
+    def process_block(self, block):
+        block = np.asarray(block, dtype=self.dtype)
+        if not len(block):
+            return np.zeros(0, dtype=self.dtype)
+        buffer = np.concatenate([self.history, block])
+        start = (-self.position) % self.factor
+        # Only the windows ending on kept samples are evaluated, i.e. each polyphase
+        # branch runs at the output rate.
+        windows = sliding_window_view(buffer, len(self.taps))[start::self.factor]
+        output = windows @ self.taps[::-1]
+        self.history = buffer[len(buffer) - len(self.history):] if len(self.history) else self.history
+        self.position += len(block)
+        return output
+
+
+class PolyphaseInterpolator:
+    def __init__(self, factor, taps=None, dtype=None):
+        self.factor = factor
+        self.dtype = resolve_dtype(dtype)
+        taps = np.asarray(design_lowpass(factor) if taps is None else taps, dtype=self.dtype) * factor
+        phase_length = -(-len(taps) // factor)
+        taps = np.concatenate([taps, np.zeros(phase_length * factor - len(taps), dtype=self.dtype)])
+        self.phases = taps.reshape(phase_length, factor).T
+        self.reset()
+
+    def reset(self):
+        self.history = np.zeros(self.phases.shape[1] - 1, dtype=self.dtype)
+
+    def process_block(self, block):
+        block = np.asarray(block, dtype=self.dtype)
+        if not len(block):
+            return np.zeros(0, dtype=self.dtype)
+        buffer = np.concatenate([self.history, block])
+        windows = sliding_window_view(buffer, self.phases.shape[1])[:, ::-1]
+        output = (windows @ self.phases.T).ravel()
+        self.history = buffer[len(buffer) - len(self.history):] if len(self.history) else self.history
+        return output
+
+
+class DecimatorStage:
+    def __init__(self, factor, taps=None, dtype=None):
+        self.factor = factor
+        self.decimator = PolyphaseDecimator(factor, taps, dtype)
+        self.clean_decimator = copy.deepcopy(self.decimator)
+
+    def reset(self):
+        self.decimator.reset()
+        self.clean_decimator.reset()
+
+    def transform_space(self, signal_space):
+        delay = (len(self.decimator.taps) - 1) / 2
+        return get_positions(signal_space, np.arange(0, len(signal_space), self.factor) - delay)
+
+    def process_block(self, block, clean_block=None):
+        if clean_block is not None:
+            clean_block = self.clean_decimator.process_block(clean_block)
+        return self.decimator.process_block(block), clean_block
+
+
+class InterpolatorStage:
+    def __init__(self, factor, taps=None, dtype=None):
+        self.factor = factor
+        self.interpolator = PolyphaseInterpolator(factor, taps, dtype)
+        self.clean_interpolator = copy.deepcopy(self.interpolator)
+
+    def reset(self):
+        self.interpolator.reset()
+        self.clean_interpolator.reset()
+
+    def transform_space(self, signal_space):
+        delay = (self.interpolator.phases.size - 1) / 2
+        indices = (np.arange(len(signal_space) * self.factor) - delay) / self.factor
+        return get_positions(signal_space, indices)
+
+    def process_block(self, block, clean_block=None):
+        if clean_block is not None:
+            clean_block = self.clean_interpolator.process_block(clean_block)
+        return self.interpolator.process_block(block), clean_block
+
+
+class FilterStage:
+    def __init__(self, filter, train=False):
+        self.filter = filter
+        self.train = train
+
+    def reset(self):
+        self.filter.start_stream()
+
+    def transform_space(self, signal_space):
+        return signal_space
+
+    def process_block(self, block, clean_block=None):
+        return self.filter.process_block(block, clean_block if self.train else None), clean_block
+
+
+class MultiratePipeline:
+    def __init__(self, stages):
+        self.stages = stages
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process_block(self, block, clean_block=None):
+        for stage in self.stages:
+            block, clean_block = stage.process_block(block, clean_block)
+        return block, clean_block
+
+    def transform_space(self, signal_space):
+        for stage in self.stages:
+            signal_space = stage.transform_space(signal_space)
+        return signal_space
+
+    @profiled('MultiratePipeline.process', samples=lambda result, pipeline, signal_space, signal, *args, **kwargs: len(signal))
+    def process(self, signal_space, signal, clean_signal=None, block_size=65536):
+        if not is_uniform(signal_space):
+            uniform_space, signal = resample_uniform(signal_space, signal)
+            if clean_signal is not None:
+                _, clean_signal = resample_uniform(signal_space, clean_signal)
+            signal_space = uniform_space
+        output_space = self.transform_space(signal_space)
+        self.reset()
+        outputs, clean_outputs = list(), list()
+        for start in range(0, len(signal), block_size):
+            clean_block = None if clean_signal is None else clean_signal[start:start + block_size]
+            block, clean_block = self.process_block(signal[start:start + block_size], clean_block)
+            outputs.append(block)
+            clean_outputs.append(clean_block)
+        output = np.concatenate(outputs) if outputs else np.zeros(0)
+        clean_output = None if clean_signal is None or not outputs else np.concatenate(clean_outputs)
+        return output_space, output, clean_output
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def interleave_minmax(x, minimums, maximums):
+    decimated_y = np.empty(2 * len(minimums), dtype=minimums.dtype)
+    decimated_y[0::2] = minimums
+    decimated_y[1::2] = maximums
+    return np.repeat(x, 2), decimated_y
+
+
+class MinMaxPyramid:
+    def __init__(self, x, y, base_factor=4, min_level_size=256):
+        x = np.asarray(x)
+        y = np.asarray(y)
+        length = min(len(x), len(y))
+        self.x, self.y = x[:length], y[:length]
+        self.is_sorted = bool(np.all(self.x[1:] >= self.x[:-1]))
+        self.levels = list()
+        if length <= base_factor:
+            return
+        factor = base_factor
+        bin_starts = np.arange(0, length, factor)
+        minimums = np.minimum.reduceat(self.y, bin_starts)
+        maximums = np.maximum.reduceat(self.y, bin_starts)
+        while True:
+            self.levels.append((factor, minimums, maximums))
+            if len(minimums) <= min_level_size:
+                break
+            pair_starts = np.arange(0, len(minimums), 2)
+            minimums = np.minimum.reduceat(minimums, pair_starts)
+            maximums = np.maximum.reduceat(maximums, pair_starts)
+            factor *= 2
+
+    @property
+    def nbytes(self):
+        return sum(minimums.nbytes + maximums.nbytes for _, minimums, maximums in self.levels)
+
+    def get_index_range(self, x_start=None, x_end=None):
+        if not self.is_sorted or x_start is None or x_end is None:
+            return 0, len(self.y)
+        start_index = max(np.searchsorted(self.x, x_start, side='right') - 1, 0)
+        end_index = min(np.searchsorted(self.x, x_end, side='left') + 1, len(self.y))
+        return start_index, end_index
+
+    def get_view(self, x_start=None, x_end=None, n_bins=1000):
+        start_index, end_index = self.get_index_range(x_start, x_end)
+        level = None
+        for factor, minimums, maximums in self.levels:
+            if (end_index - start_index) / factor < n_bins:
+                break
+            level = (factor, minimums, maximums)
+        if level is None:
+            return self.x[start_index:end_index], self.y[start_index:end_index]
+        factor, minimums, maximums = level
+        start_bin = start_index // factor
+        end_bin = -(-end_index // factor)
+        return interleave_minmax(self.x[start_bin * factor:end_index:factor],
+                                 minimums[start_bin:end_bin], maximums[start_bin:end_bin])
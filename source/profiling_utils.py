@@ -0,0 +1,164 @@
+import atexit
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.records = dict()
+        self.captures = list()
+        self._capture_mode = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def capture_next(self, mode='cprofile'):
+        if mode not in ('cprofile', 'tracemalloc'):
+            raise ValueError(f'Unknown capture mode: {mode}')
+        self.enabled = True
+        self._capture_mode = mode
+
+    def add_record(self, name, elapsed, samples=None):
+        with self._lock:
+            record = self.records.setdefault(name, {'calls': 0, 'total_time': 0.0, 'max_time': 0.0, 'samples': 0})
+            record['calls'] += 1
+            record['total_time'] += elapsed
+            record['max_time'] = max(record['max_time'], elapsed)
+            if samples:
+                record['samples'] += samples
+
+    def run(self, name, function, args, kwargs, samples=None):
+        depth = getattr(self._local, 'depth', 0)
+        capture_mode = self._capture_mode if depth == 0 else None
+        if capture_mode:
+            self._capture_mode = None
+            return self._run_captured(name, capture_mode, function, args, kwargs, samples)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.depth = depth
+        self.add_record(name, elapsed, samples(result, *args, **kwargs) if samples else None)
+        return result
+
+    def _run_captured(self, name, mode, function, args, kwargs, samples):
+        import cProfile
+        import pstats
+        import tracemalloc
+        if mode == 'cprofile':
+            profile = cProfile.Profile()
+            profile.enable()
+        else:
+            tracemalloc.start()
+        try:
+            result = self.run(name, function, args, kwargs, samples)
+        finally:
+            stream = io.StringIO()
+            if mode == 'cprofile':
+                profile.disable()
+                pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(30)
+            else:
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                stream.write(f'current={current} B, peak={peak} B\n')
+                for statistic in snapshot.statistics('lineno')[:30]:
+                    stream.write(f'{statistic}\n')
+            self.captures.append({'name': name, 'mode': mode, 'report': stream.getvalue()})
+        return result
+
+    def get_report(self):
+        report = list()
+        with self._lock:
+            records = [(name, dict(record)) for name, record in self.records.items()]
+        for name, record in records:
+            samples_per_second = record['samples'] / record['total_time'] if record['total_time'] else 0.0
+            report.append(dict(name=name, samples_per_second=samples_per_second, **record))
+        return sorted(report, key=lambda record: record['total_time'], reverse=True)
+
+    def dump_json(self, path=None):
+        content = json.dumps({'records': self.get_report(), 'captures': self.captures}, indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(content)
+        return content
+
+    def summary_table(self):
+        lines = [f'{"operation":<45}{"calls":>7}{"total, s":>11}{"max, s":>10}{"samples":>12}{"samples/s":>14}']
+        for record in self.get_report():
+            lines.append(f'{record["name"]:<45}{record["calls"]:>7}{record["total_time"]:>11.4f}'
+                         f'{record["max_time"]:>10.4f}{record["samples"]:>12}{record["samples_per_second"]:>14.1f}')
+        return '\n'.join(lines)
+
+
+profiler = Profiler()
+
+
+def profiled(name=None, samples=None):
+    def decorator(function):
+        operation_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            return profiler.run(operation_name, function, args, kwargs, samples)
+        return wrapper
+    return decorator
+
+
+def profiled_slot(name=None):
+    # Qt passes extra signal arguments (e.g. "checked") to callables accepting *args,
+    # so button handlers keep their exact one-argument signature.
+    def decorator(function):
+        profiled_function = profiled(name, None)(function)
+
+        @functools.wraps(function)
+        def wrapper(self):
+            return profiled_function(self)
+        return wrapper
+    return decorator
+
+
+def count_signal_space(result, manager, *args, **kwargs):
+    return len(manager.signal_space)
+
+
+def count_result(result, *args, **kwargs):
+    return len(result) if result is not None else 0
+
+
+def configure_from_environment():
+    if not os.environ.get('DIGITAFI_PROFILE'):
+        return
+    profiler.enable()
+    capture_mode = os.environ.get('DIGITAFI_PROFILE_CAPTURE')
+    if capture_mode:
+        profiler.capture_next(capture_mode)
+    atexit.register(report_at_exit, os.environ.get('DIGITAFI_PROFILE_OUTPUT'))
+
+
+def report_at_exit(path=None):
+    if path:
+        profiler.dump_json(path)
+    print(profiler.summary_table())
+    for capture in profiler.captures:
+        print(f'\n[{capture["mode"]}] {capture["name"]}\n{capture["report"]}')
+
+
+configure_from_environment()
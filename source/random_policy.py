@@ -0,0 +1,39 @@
+import os
+import numpy as np
+
+
+class RandomPolicy:
+    def __init__(self, seed=None):
+        self.set(seed)
+
+    def set(self, seed=None):
+        self.seed = seed
+        self._generator = None
+
+    @property
+    def generator(self):
+        # Created on first use: importing numpy.random costs more than the headless
+        # modules' import budgets allow.
+        if self._generator is None:
+            self._generator = np.random.default_rng(self.seed)
+        return self._generator
+
+
+default_policy = RandomPolicy(int(os.environ['DIGITAFI_SEED']) if os.environ.get('DIGITAFI_SEED') else None)
+
+
+def set_default_seed(seed=None):
+    default_policy.set(seed)
+
+
+def resolve_rng(rng=None):
+    return np.random.default_rng(rng) if rng is not None else default_policy.generator
+
+
+def spawn_rngs(rng, n):
+    # Child streams belong to work items rather than workers, so the same seed gives
+    # the same result however the items are spread over threads or processes.
+    if rng is None or isinstance(rng, np.random.Generator):
+        return resolve_rng(rng).spawn(n)
+    sequence = rng if isinstance(rng, np.random.SeedSequence) else np.random.SeedSequence(rng)
+    return [np.random.default_rng(child) for child in sequence.spawn(n)]
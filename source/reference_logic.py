@@ -0,0 +1,163 @@
+import numpy as np
+import random
+
+# Frozen copies of the original pure-Python implementations. They are the
+# oracles that every alternative engine is checked against in
+# source.equivalence_utils, so they must not be optimised or "fixed".
+
+
+class ReferenceFilter:
+    def __init__(self, learning_rate=0.2):
+        self.reset()
+        self.n = learning_rate
+
+    def reset(self):
+        self._weight_group_list = ['in', 'out']
+        self.weights = {group : list() for group in self._weight_group_list}
+        self.input_values = {group : list() for group in self._weight_group_list}
+
+    def update_weights(self, error):
+        for group in self._weight_group_list:
+            for value_index, value in enumerate(self.input_values[group]):
+                if self.weights[group][value_index]['status'] == False:
+                    continue
+                self.weights[group][value_index]['value'] -= self.n * error * value
+
+    def get_output(self):
+        sum_value = 0
+        for group in self._weight_group_list:
+            for value_index, value in enumerate(self.input_values[group]):
+                if self.weights[group][value_index]['status'] == False:
+                    continue
+                sum_value += self.weights[group][value_index]['value'] * value
+        return sum_value
+
+    def make_step(self, current_noised, current_filtered):
+        self.input_values['in'].insert(0, current_noised)
+        self.input_values['in'].pop()
+        self.input_values['out'].insert(0, current_filtered)
+        self.input_values['out'].pop()
+        return self.get_output()
+
+    def train(self, clean_y, noised_y):
+        filtered_sequence = noised_y[:1]
+        learning_rate = self.n
+        step = 1
+        while step < len(clean_y):
+            output = self.make_step(noised_y[step], filtered_sequence[-1])
+            filtered_sequence = np.append(filtered_sequence, output)
+            error = output - clean_y[step]
+            self.update_weights(error)
+            step += 1
+            learning_rate *= 0.99
+        return filtered_sequence
+
+    def predict(self, noised_y):
+        filtered_sequence = noised_y[:1]
+        step = 1
+        while step < len(noised_y):
+            output = self.make_step(noised_y[step], filtered_sequence[-1])
+            filtered_sequence = np.append(filtered_sequence, output)
+            step += 1
+        return filtered_sequence
+
+
+class ReferenceDigitalFilter:
+    def update_weights(self, error, input):
+        for i in range(len(self.w)):
+            self.w[i] -= self.n * error * input[i]
+
+    def get_output(self, input):
+        y = 0
+        for i in range(len(self.w)):
+            y += self.w[i] * input[i]
+        return y
+
+
+class ReferenceFirstDegreeFilter(ReferenceDigitalFilter):
+    def __init__(self, delta_t=1*10**-4):
+        self.delta_t = delta_t
+        self.n = 0.4
+        self.step = 1
+        self.w = [1/2 for _ in range(2)]
+
+    def train(self, clean_signal, sequence):
+        filtered_sequence = sequence[:1]
+        self.step = 1
+        while self.step < len(clean_signal):
+            input = [sequence[self.step], filtered_sequence[-1]]
+            output = self.get_output(input)
+            filtered_sequence = np.append(filtered_sequence, output)
+            error = output - clean_signal[self.step]
+            self.update_weights(error, input)
+            self.step += 1
+            self.n *= 0.99
+        return filtered_sequence
+
+    def predict(self, sequence):
+        filtered_sequence = sequence[:1]
+        for x in sequence[1:]:
+            input = [x, filtered_sequence[-1]]
+            output = self.get_output(input)
+            filtered_sequence = np.append(filtered_sequence, output)
+        return filtered_sequence
+
+
+class ReferenceSecondDegreeFilter(ReferenceDigitalFilter):
+    def __init__(self, delta_t=1*10**-4):
+        self.delta_t = delta_t
+        self.n = 0.4
+        self.step = 1
+        self.w = [1/3 for _ in range(3)]
+
+    def train(self, clean_signal, sequence):
+        filtered_sequence = sequence[:2]
+        self.step = 1
+        while self.step < len(clean_signal):
+            input = [sequence[self.step], filtered_sequence[-1], filtered_sequence[-2]]
+            output = self.get_output(input)
+            filtered_sequence = np.append(filtered_sequence, output)
+            error = output - clean_signal[self.step]
+            self.update_weights(error, input)
+            self.step += 1
+            self.n *= 0.99
+        return filtered_sequence
+
+    def predict(self, sequence):
+        filtered_sequence = sequence[:2]
+        for x in sequence[2:]:
+            input = [x, filtered_sequence[-1], filtered_sequence[-2]]
+            output = self.get_output(input)
+            filtered_sequence = np.append(filtered_sequence, output)
+        return filtered_sequence
+
+
+class ReferenceSignalCollection:
+    def sine(self, frequency=1):
+        x = np.linspace(0, 20, 1000)
+        clean_y = np.sin(x*frequency)
+        noised_y = np.array([i + random.random()*2 - 1 for i in clean_y])
+        return x, clean_y, noised_y
+
+
+def reference_af_characteristics(filter):
+    first_amplitude_list = list()
+    for frequency in range(1, 25000, 200):
+        _, _, noised_y = ReferenceSignalCollection.sine(frequency/1000)
+        predict_filtered = filter.predict(noised_y)
+        square_sum = sum([value ** 2 for value in predict_filtered])
+        first_amplitude_list.append((square_sum/len(predict_filtered)) ** .5)
+    return first_amplitude_list
+
+
+def reference_impulse_characteristics(filter):
+    impulse = [0] * 50
+    impulse[0] = 1
+    predict_filtered = filter.predict(impulse)
+    return predict_filtered, impulse
+
+
+def reference_step_characteristics(filter):
+    step = [1] * 50
+    predict_filtered = filter.predict(step)
+    return predict_filtered, step
@@ -0,0 +1,151 @@
+import atexit
+import contextlib
+import itertools
+import os
+import secrets
+from multiprocessing import shared_memory
+import numpy as np
+
+
+SEGMENT_PREFIX = 'digitafi'
+SHARED_MEMORY_DIRECTORY = '/dev/shm'
+
+
+def get_segment_name(token, index):
+    return f'{SEGMENT_PREFIX}_{os.getpid()}_{token}_{index}'
+
+
+def get_segment_owner(segment_name):
+    parts = segment_name.lstrip('/').split('_')
+    if len(parts) != 4 or parts[0] != SEGMENT_PREFIX or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_stale_segments():
+    removed = list()
+    if not os.path.isdir(SHARED_MEMORY_DIRECTORY):
+        return removed
+    for segment_name in os.listdir(SHARED_MEMORY_DIRECTORY):
+        owner = get_segment_owner(segment_name)
+        if owner is None or is_process_alive(owner):
+            continue
+        try:
+            os.unlink(os.path.join(SHARED_MEMORY_DIRECTORY, segment_name))
+        except FileNotFoundError:
+            continue
+        removed.append(segment_name)
+    return removed
+
+
+class SharedSignalRegistry:
+    def __init__(self):
+        self.token = secrets.token_hex(4)
+        self.segments = dict()
+        self.descriptors = dict()
+        self._indices = itertools.count()
+        self.closed = False
+        cleanup_stale_segments()
+        atexit.register(self.close)
+
+    def publish(self, name, array, version=None):
+        descriptor = self.descriptors.get(name)
+        if descriptor is not None and version is not None and descriptor['version'] == version:
+            return descriptor
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(get_segment_name(self.token, next(self._indices)),
+                                             create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        self.unpublish(name)
+        self.segments[name] = segment
+        self.descriptors[name] = {'segment': segment.name, 'shape': array.shape,
+                                  'dtype': array.dtype.str, 'version': version}
+        return self.descriptors[name]
+
+    def unpublish(self, name):
+        segment = self.segments.pop(name, None)
+        self.descriptors.pop(name, None)
+        if segment is not None:
+            close_segment(segment)
+            segment.unlink()
+
+    def get_descriptors(self, names=None):
+        names = self.descriptors if names is None else names
+        return {name: dict(self.descriptors[name]) for name in names}
+
+    def get_array(self, name):
+        descriptor = self.descriptors[name]
+        return np.ndarray(descriptor['shape'], dtype=descriptor['dtype'], buffer=self.segments[name].buf)
+
+    def close(self):
+        if self.closed:
+            return
+        for name in list(self.segments):
+            self.unpublish(name)
+        self.closed = True
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AttachedSignals:
+    def __init__(self, descriptors):
+        self.segments = list()
+        self.arrays = {name: self.attach(descriptor) for name, descriptor in descriptors.items()}
+
+    def attach(self, descriptor):
+        shape, dtype = tuple(descriptor['shape']), np.dtype(descriptor['dtype'])
+        if not int(np.prod(shape)):
+            return np.empty(shape, dtype=dtype)
+        path = os.path.join(SHARED_MEMORY_DIRECTORY, descriptor['segment'].lstrip('/'))
+        if os.path.exists(path):
+            # Mapping the segment file directly keeps workers out of the resource tracker,
+            # which would otherwise unlink the segment when they exit (before Python 3.13).
+            return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+        try:
+            segment = shared_memory.SharedMemory(descriptor['segment'], track=False)
+        except TypeError:
+            segment = shared_memory.SharedMemory(descriptor['segment'])
+        self.segments.append(segment)
+        array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        array.flags.writeable = False
+        return array
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self):
+        self.arrays.clear()
+        for segment in self.segments:
+            close_segment(segment)
+        self.segments.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def close_segment(segment):
+    # Views handed out to callers keep the mapping alive until they are released.
+    with contextlib.suppress(BufferError):
+        segment.close()
+
+
+def attach_signals(descriptors):
+    return AttachedSignals(descriptors)
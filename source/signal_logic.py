@@ -1,15 +1,21 @@
 import numpy as np
-import random
+from source.dtype_policy import resolve_dtype
+from source.random_policy import resolve_rng
+
+
+def get_uniform_noised(clean_y, dtype=None, rng=None):
+    noise = resolve_rng(rng).random(len(clean_y))
+    return (np.asarray(clean_y, dtype=np.float64) + noise*2 - 1).astype(resolve_dtype(dtype))
 
 
 class SignalCollection:
-    def sine(self, frequency=1):
+    def sine(self, frequency=1, dtype=None, rng=None):
         x = np.linspace(0, 20, 1000)
-        clean_y = np.sin(x*frequency)
-        noised_y = np.array([i + random.random()*2 - 1 for i in clean_y])
+        clean_y = np.sin(x*frequency).astype(resolve_dtype(dtype))
+        noised_y = get_uniform_noised(clean_y, dtype, rng)
         return x, clean_y, noised_y
 
-    def triangular(self, width=100, period=200):
+    def triangular(self, width=100, period=200, dtype=None, rng=None):
         x = np.linspace(0, 20, 1000)
         clean_y = list()
         while len(clean_y) < len(x):
@@ -18,10 +24,10 @@ class SignalCollection:
             zeros_part = [0] * (period - width)
             clean_y = clean_y + list(ascending_part) + list(descending_part) + list(zeros_part)
         clean_y = clean_y[:len(x)]
-        noised_y = np.array([i + random.random()*2 - 1 for i in clean_y])
+        noised_y = get_uniform_noised(clean_y, dtype, rng)
         return x, clean_y, noised_y
 
-    def rectangular(self, width=100, period=200):
+    def rectangular(self, width=100, period=200, dtype=None, rng=None):
         x = np.linspace(0, 20, 1000)
         clean_y = list()
         for index, _ in enumerate(x):
@@ -29,10 +35,10 @@ class SignalCollection:
                 clean_y.append(0)
             else:
                 clean_y.append(1)
-        noised_y = np.array([i + random.random()*2 - 1 for i in clean_y])
+        noised_y = get_uniform_noised(clean_y, dtype, rng)
         return x, clean_y, noised_y
 
-    def stairs(self, step=1, period=200):
+    def stairs(self, step=1, period=200, dtype=None, rng=None):
         x = np.linspace(0, 20, 1000)
         clean_y = list()
         current_level = 0
@@ -41,14 +47,15 @@ class SignalCollection:
             clean_y = clean_y + list(step_part)
             current_level += step
         clean_y = clean_y[:len(x)]
-        noised_y = np.array([i + random.random()*2 - 1 for i in clean_y])
+        noised_y = get_uniform_noised(clean_y, dtype, rng)
         return x, clean_y, noised_y
     
 
 class SignalProcessor:
-    def __init__(self):
+    def __init__(self, dtype=None):
         self.start = 0
         self.end = 1
+        self.dtype = resolve_dtype(dtype)
 
     def get_signal_space(self, start=0, end=20, n_points=1000):
         return np.linspace(start, end, n_points)
@@ -57,7 +64,7 @@ class SignalProcessor:
         self.start = start
         self.end = end
         x = np.linspace(start, end, n_points)
-        y = x * 0
+        y = np.zeros(n_points, dtype=self.dtype)
         return x, y
     
     def assert_bounds(self, signal_space, start=None, end=None):
@@ -69,36 +76,98 @@ class SignalProcessor:
             return end, start
         return start, end
     
-    def get_value_index(self, array, x):
-        x_index = 0
-        for index, value in enumerate(array):
-            if x >= value:
-                x_index = index
-        return x_index
-    
-    def add_sine(self, x, input_signal, frequency=1, amplitude=1, phase=0, start=None, end=None):
+    def get_value_index(self, array, x, is_sorted=False):
+        if is_sorted:
+            return max(int(np.searchsorted(array, x, side='right')) - 1, 0)
+        indices = np.flatnonzero(np.asarray(array) <= x)
+        return int(indices[-1]) if len(indices) else 0
+
+    def get_range_indices(self, x, start=None, end=None, is_sorted=False):
         start, end = self.assert_bounds(x, start, end)
-        start_index = self.get_value_index(x, start)
-        end_index = self.get_value_index(x, end)
-        output_signal = np.array(input_signal)
-        for index, value in enumerate(output_signal[start_index:end_index+1], start=start_index):
-            output_signal[index] = value + amplitude * np.sin(x[index] * frequency + phase)
+        return self.get_value_index(x, start, is_sorted), self.get_value_index(x, end, is_sorted)
+
+    def get_sine(self, x, frequency=1, amplitude=1, phase=0):
+        return amplitude * np.sin(x * frequency + phase)
+
+    def get_linear(self, x, angle, offset):
+        return x * angle + offset
+
+    def get_noise(self, length, amplitude, rng=None):
+        return amplitude * (resolve_rng(rng).random(length) - .5) * 2
+
+    def add_sine(self, x, input_signal, frequency=1, amplitude=1, phase=0, start=None, end=None):
+        start_index, end_index = self.get_range_indices(x, start, end)
+        output_signal = np.array(input_signal, dtype=self.dtype)
+        output_signal[start_index:end_index+1] += self.get_sine(x[start_index:end_index+1], frequency, amplitude, phase)
         return output_signal
     
     def add_linear(self, x, input_signal, angle, offset, start=None, end=None):
-        start, end = self.assert_bounds(x, start, end)
-        start_index = np.where(x == start)[0][0]
-        end_index = np.where(x == end)[0][0]
-        output_signal = np.array(input_signal)
-        for index, value in enumerate(output_signal[start_index:end_index+1], start=start_index):
-            output_signal[index] = value + x[index] * angle + offset
+        start_index, end_index = self.get_range_indices(x, start, end)
+        output_signal = np.array(input_signal, dtype=self.dtype)
+        output_signal[start_index:end_index+1] += self.get_linear(x[start_index:end_index+1], angle, offset)
         return output_signal
     
-    def add_noise(self, x, input_signal, amplitude, start=None, end=None):
-        start, end = self.assert_bounds(x, start, end)
-        start_index = np.where(x == start)[0][0]
-        end_index = np.where(x == end)[0][0]
-        output_signal = np.array(input_signal)
-        for index, value in enumerate(output_signal[start_index:end_index+1], start=start_index):
-            output_signal[index] = value + amplitude * (random.random()-.5) * 2
-        return output_signal
\ No newline at end of file
+    def add_noise(self, x, input_signal, amplitude, start=None, end=None, rng=None):
+        start_index, end_index = self.get_range_indices(x, start, end)
+        output_signal = np.array(input_signal, dtype=self.dtype)
+        output_signal[start_index:end_index+1] += self.get_noise(end_index + 1 - start_index, amplitude, rng)
+        return output_signal
+
+
+class LazySignal:
+    def __init__(self, signal_space, base_signal=None, dtype=None):
+        self.signal_space = signal_space
+        self.base_signal = base_signal
+        self.signal_processor = SignalProcessor(dtype)
+        self.operations = list()
+        self._is_sorted = None
+        self._cache = None
+        self._applied_n = 0
+
+    def __len__(self):
+        return len(self.signal_space)
+
+    def is_materialized(self):
+        return self._cache is not None and self._applied_n == len(self.operations)
+
+    def add_operation(self, kind, start, end, **parameters):
+        if self._is_sorted is None:
+            self._is_sorted = bool(np.all(self.signal_space[1:] >= self.signal_space[:-1]))
+        start_index, end_index = self.signal_processor.get_range_indices(self.signal_space, start, end, self._is_sorted)
+        self.operations.append((kind, start_index, end_index, parameters))
+
+    def add_sine(self, frequency=1, amplitude=1, phase=0, start=None, end=None):
+        self.add_operation('sine', start, end, frequency=frequency, amplitude=amplitude, phase=phase)
+
+    def add_linear(self, angle, offset, start=None, end=None):
+        self.add_operation('linear', start, end, angle=angle, offset=offset)
+
+    def add_noise(self, amplitude, start=None, end=None, rng=None):
+        # The operation keeps a seed rather than a generator, so releasing and
+        # materializing again reproduces the same noise.
+        self.add_operation('noise', start, end, amplitude=amplitude, rng=int(resolve_rng(rng).integers(2**63)))
+
+    def evaluate_operation(self, kind, start_index, end_index, parameters):
+        x = self.signal_space[start_index:end_index+1]
+        if kind == 'sine':
+            return self.signal_processor.get_sine(x, **parameters)
+        if kind == 'linear':
+            return self.signal_processor.get_linear(x, **parameters)
+        return self.signal_processor.get_noise(len(x), **parameters)
+
+    def materialize(self):
+        if self._cache is None:
+            dtype = self.signal_processor.dtype
+            if self.base_signal is None:
+                self._cache = np.zeros(len(self.signal_space), dtype=dtype)
+            else:
+                self._cache = np.array(self.base_signal, dtype=dtype)
+            self._applied_n = 0
+        for kind, start_index, end_index, parameters in self.operations[self._applied_n:]:
+            self._cache[start_index:end_index+1] += self.evaluate_operation(kind, start_index, end_index, parameters)
+        self._applied_n = len(self.operations)
+        return self._cache
+
+    def release(self):
+        self._cache = None
+        self._applied_n = 0
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+GUARD_ACTIONS = ['abort', 'rollback', 'shrink']
+PROGRESS_INTERVAL = 1000
+
+
+class FilterDivergenceError(Exception):
+    def __init__(self, reason, step, value, learning_rate):
+        self.reason = reason
+        self.step = step
+        self.value = value
+        self.learning_rate = learning_rate
+        super().__init__(f'Filter diverged at sample {step} ({reason}: {value!r}, learning rate {learning_rate!r})')
+
+
+def get_pole_radius(filter):
+    out_slice = filter.get_group_slice('out')
+    feedback = filter.coefficients[out_slice] * filter.statuses[out_slice]
+    if not len(feedback) or not np.any(feedback):
+        return 0.0
+    if not np.all(np.isfinite(feedback)):
+        return np.inf
+    return float(np.max(np.abs(np.roots(np.concatenate([[1], -feedback.astype(np.float64)])))))
+
+
+class DivergenceGuard:
+    def __init__(self, action='abort', check_interval=256, max_gain=1e6, pole_interval=None,
+                 max_pole_radius=1.0, shrink_factor=0.5, max_recoveries=8):
+        if action not in GUARD_ACTIONS:
+            raise ValueError(f'Unknown divergence action: {action}')
+        self.action = action
+        self.check_interval = check_interval
+        self.max_gain = max_gain
+        self.pole_interval = pole_interval
+        self.max_pole_radius = max_pole_radius
+        self.shrink_factor = shrink_factor
+        self.max_recoveries = max_recoveries
+        self.recoveries = 0
+
+    def get_problem_step(self, output, position, limit):
+        # Index of the first output sample that is non-finite or over the limit; the last
+        # sample of the block when only the weights went bad.
+        with np.errstate(invalid='ignore'):
+            bad = np.flatnonzero(~np.isfinite(output) | (np.abs(output) > limit))
+        return position + (int(bad[0]) if len(bad) else len(output) - 1)
+
+    def find_problem(self, filter, input, output, position, last_pole_check):
+        end = position + len(output)
+        magnitude = float(np.max(np.abs(output))) if len(output) else 0.0
+        limit = self.max_gain * max(float(np.max(np.abs(input))) if len(input) else 0.0, 1.0)
+        if not np.isfinite(magnitude) or not np.all(np.isfinite(filter.coefficients)):
+            return 'non-finite', magnitude, self.get_problem_step(output, position, limit)
+        if magnitude > limit:
+            return 'magnitude', magnitude, self.get_problem_step(output, position, limit)
+        if self.pole_interval and end - last_pole_check >= self.pole_interval:
+            radius = get_pole_radius(filter)
+            if radius >= self.max_pole_radius:
+                return 'pole radius', radius, end - 1
+        return None, None, None
+
+    def get_snapshot(self, filter):
+        return filter.coefficients.copy(), filter.state.copy(), filter.previous_output, filter.n
+
+    def restore(self, filter, snapshot):
+        coefficients, state, previous_output, learning_rate = snapshot
+        filter.coefficients, filter.state, filter.previous_output = coefficients.copy(), state.copy(), previous_output
+        filter.n = learning_rate
+
+    def process(self, filter, noised_y, clean_y=None, progress_callback=None):
+        length = len(noised_y) if clean_y is None else len(clean_y)
+        filtered_sequence = np.empty(length, dtype=filter.dtype)
+        self.recoveries = 0
+        position, last_pole_check, block_recoveries = 0, 0, 0
+        snapshot = self.get_snapshot(filter)
+        while position < length:
+            end = min(position + self.check_interval, length)
+            input = noised_y[position:end]
+            with np.errstate(over='ignore', invalid='ignore'):
+                output = filter.process_block(input, None if clean_y is None else clean_y[position:end])
+            reason, value, step = self.find_problem(filter, input, output, position, last_pole_check)
+            if reason is not None:
+                if self.action != 'abort':
+                    self.restore(filter, snapshot)
+                if self.action != 'shrink' or clean_y is None or self.recoveries >= self.max_recoveries:
+                    raise FilterDivergenceError(reason, step, value, filter.n)
+                # The restored rate is the one from before the failed attempt, so repeated
+                # failures of the same block keep shrinking it.
+                block_recoveries += 1
+                filter.n *= self.shrink_factor ** block_recoveries
+                self.recoveries += 1
+                continue
+            block_recoveries = 0
+            if self.pole_interval and end - last_pole_check >= self.pole_interval:
+                last_pole_check = end
+            filtered_sequence[position:end] = output
+            snapshot = self.get_snapshot(filter)
+            if progress_callback and end // PROGRESS_INTERVAL != position // PROGRESS_INTERVAL:
+                progress_callback(end, length)
+            position = end
+        return filtered_sequence
@@ -0,0 +1,101 @@
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+import numpy as np
+from source.dtype_policy import resolve_dtype
+from source.filter_service import ServiceStats
+from source.io_utils import read_signal_file, write_signal_file
+from source.stream_runner import DEFAULT_FRAME_SIZE, parse_address, read_frame
+
+
+CONNECT_TIMEOUT = 10
+
+
+def connect(family, address, timeout=CONNECT_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while True:
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            connection.connect(address)
+            return connection
+        except (FileNotFoundError, ConnectionRefusedError):
+            connection.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def send_frames(signal, writer, frame_size, rate, sent_times):
+    started = time.perf_counter()
+    for start in range(0, len(signal), frame_size):
+        if rate:
+            # Frames are paced against an absolute schedule so that late frames do not
+            # accumulate drift.
+            delay = started + start / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent_times.append(time.perf_counter())
+        writer.write(signal[start:start + frame_size].tobytes())
+        writer.flush()
+
+
+def receive_frames(reader, length, frame_size, dtype, sent_times, stats, outputs):
+    frame_bytes = frame_size * dtype.itemsize
+    for index, start in enumerate(range(0, length, frame_size)):
+        data = read_frame(reader, min(frame_bytes, (length - start) * dtype.itemsize))
+        if not data:
+            break
+        outputs.append(np.frombuffer(data, dtype=dtype))
+        stats.add_batch(1, len(outputs[-1]), [time.perf_counter() - sent_times[index]])
+
+
+def replay(signal, target, frame_size=DEFAULT_FRAME_SIZE, rate=0, dtype=None):
+    dtype = resolve_dtype(dtype)
+    signal = np.ascontiguousarray(signal, dtype=dtype)
+    stats, sent_times, outputs = ServiceStats(), list(), list()
+    family, address = parse_address(target)
+    if family is None:
+        # One-way targets: the output goes elsewhere, so only the send rate is reported.
+        if target == '-':
+            send_frames(signal, sys.stdout.buffer, frame_size, rate, sent_times)
+        else:
+            with open(target, 'wb') as writer:
+                send_frames(signal, writer, frame_size, rate, sent_times)
+        stats.add_batch(len(sent_times), len(signal), [])
+        return None, stats.get_report()
+    with connect(family, address) as connection:
+        reader, writer = connection.makefile('rb', buffering=0), connection.makefile('wb')
+        receiver = threading.Thread(target=receive_frames,
+                                    args=(reader, len(signal), frame_size, dtype, sent_times, stats, outputs))
+        receiver.start()
+        send_frames(signal, writer, frame_size, rate, sent_times)
+        connection.shutdown(socket.SHUT_WR)
+        receiver.join()
+    return np.concatenate(outputs) if outputs else np.zeros(0, dtype=dtype), stats.get_report()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Replay a signal capture as raw float frames at a fixed rate')
+    parser.add_argument('signal', help='capture in the default_signal.txt format')
+    parser.add_argument('target', help="'-' for stdout, a file or named pipe path, unix:PATH or tcp:HOST:PORT")
+    parser.add_argument('--rate', type=float, default=0, help='samples per second, 0 sends as fast as possible')
+    parser.add_argument('--frame-size', type=int, default=DEFAULT_FRAME_SIZE)
+    parser.add_argument('--dtype')
+    parser.add_argument('--output', help='save the filtered signal returned over a socket (.txt)')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    signal_space, signal = read_signal_file(arguments.signal, arguments.dtype)
+    filtered, report = replay(signal, arguments.target, arguments.frame_size, arguments.rate, arguments.dtype)
+    if arguments.output and filtered is not None:
+        write_signal_file(arguments.output, filtered, signal_space)
+    print(json.dumps(report), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
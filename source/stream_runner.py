@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import numpy as np
+from source.dtype_policy import resolve_dtype
+from source.filter_io import load_filter
+from source.filter_service import ServiceStats
+
+
+DEFAULT_FRAME_SIZE = 256
+DEFAULT_QUEUE_SIZE = 8
+QUEUE_TIMEOUT = 0.1
+
+
+class StreamFrame:
+    def __init__(self, samples, received):
+        self.samples = samples
+        self.received = received
+
+
+def read_frame(stream, frame_bytes):
+    buffer = bytearray(frame_bytes)
+    view = memoryview(buffer)
+    filled = 0
+    while filled < frame_bytes:
+        read_n = stream.readinto(view[filled:])
+        if not read_n:
+            break
+        filled += read_n
+    return bytes(buffer[:filled])
+
+
+def parse_address(specification):
+    kind, _, address = specification.partition(':')
+    if kind == 'unix':
+        return socket.AF_UNIX, address
+    if kind == 'tcp':
+        host, _, port = address.rpartition(':')
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    return None, None
+
+
+def open_streams(input_specification, output_file=None):
+    if input_specification == '-':
+        reader = sys.stdin.buffer
+        return reader, open(output_file, 'wb') if output_file else sys.stdout.buffer, None
+    family, address = parse_address(input_specification)
+    if family is None:
+        reader = open(input_specification, 'rb', buffering=0)
+        return reader, open(output_file, 'wb') if output_file else sys.stdout.buffer, None
+    server = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_UNIX and os.path.exists(address):
+        os.unlink(address)
+    server.bind(address)
+    server.listen(1)
+    connection, _ = server.accept()
+    server.close()
+    reader, writer = connection.makefile('rb', buffering=0), connection.makefile('wb')
+    return reader, open(output_file, 'wb') if output_file else writer, connection
+
+
+class StreamRunner:
+    def __init__(self, filter, frame_size=DEFAULT_FRAME_SIZE, dtype=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.filter = filter
+        self.frame_size = frame_size
+        self.dtype = resolve_dtype(dtype)
+        self.input_queue = queue.Queue(queue_size)
+        self.output_queue = queue.Queue(queue_size)
+        self.stats = ServiceStats()
+        self.errors = list()
+
+    def run_thread(self, function, *args):
+        try:
+            function(*args)
+        except Exception as error:
+            self.errors.append(error)
+
+    def put(self, stream_queue, frame):
+        # Blocks while the queue is full (backpressure), but gives up once another
+        # thread has failed so the pipeline can shut down.
+        while not self.errors:
+            try:
+                return stream_queue.put(frame, timeout=QUEUE_TIMEOUT)
+            except queue.Full:
+                pass
+
+    def get(self, stream_queue):
+        while not self.errors:
+            try:
+                return stream_queue.get(timeout=QUEUE_TIMEOUT)
+            except queue.Empty:
+                pass
+        return None
+
+    def read_frames(self, reader):
+        frame_bytes = self.frame_size * self.dtype.itemsize
+        while not self.errors:
+            data = read_frame(reader, frame_bytes)
+            data = data[:len(data) - len(data) % self.dtype.itemsize]
+            if not data:
+                break
+            self.put(self.input_queue, StreamFrame(np.frombuffer(data, dtype=self.dtype), time.perf_counter()))
+        self.put(self.input_queue, None)
+
+    def filter_frames(self):
+        self.filter.start_stream()
+        while True:
+            frame = self.get(self.input_queue)
+            if frame is None:
+                break
+            with np.errstate(over='ignore', invalid='ignore'):
+                output = self.filter.process_block(frame.samples).astype(self.dtype, copy=False)
+            self.put(self.output_queue, StreamFrame(output, frame.received))
+        self.put(self.output_queue, None)
+
+    def write_frames(self, writer):
+        while True:
+            frame = self.get(self.output_queue)
+            if frame is None:
+                break
+            writer.write(frame.samples.tobytes())
+            writer.flush()
+            self.stats.add_batch(1, len(frame.samples), [time.perf_counter() - frame.received])
+
+    def run(self, reader, writer):
+        threads = [threading.Thread(target=self.run_thread, args=(function, *args), daemon=True)
+                   for function, args in [(self.read_frames, (reader,)), (self.filter_frames, ()),
+                                          (self.write_frames, (writer,))]]
+        for thread in threads:
+            thread.start()
+        for thread in threads[1:]:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.stats.get_report()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Filter raw float frames from stdin, a named pipe or a socket')
+    parser.add_argument('input', help="'-' for stdin, a file or named pipe path, unix:PATH or tcp:HOST:PORT")
+    parser.add_argument('--filter', required=True, help='filter file (.npz or .json)')
+    parser.add_argument('--output', help='output file or named pipe (stdout, or the socket itself, otherwise)')
+    parser.add_argument('--frame-size', type=int, default=DEFAULT_FRAME_SIZE)
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--dtype')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    runner = StreamRunner(load_filter(arguments.filter), arguments.frame_size, arguments.dtype, arguments.queue_size)
+    reader, writer, connection = open_streams(arguments.input, arguments.output)
+    try:
+        report = runner.run(reader, writer)
+    finally:
+        if arguments.output:
+            writer.close()
+        if connection is not None:
+            connection.close()
+    print(json.dumps(report), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
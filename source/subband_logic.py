@@ -0,0 +1,184 @@
+import copy
+import multiprocessing
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from source.dtype_policy import resolve_dtype
+from source.batch_logic import process_members
+from source.profiling_utils import profiled
+
+
+BANK_OVERLAP = 8
+KAISER_BETA = 8
+SUBBAND_MODES = ['batch', 'processes']
+
+
+def design_prototype(bands, overlap=BANK_OVERLAP, beta=KAISER_BETA):
+    length = 2 * overlap * bands
+    n = np.arange(length) - (length - 1) / 2
+    window = np.kaiser(length, beta)
+    edge = np.exp(-1j * np.pi / (2 * bands) * np.arange(length))
+    low, high = 0.25 * np.pi / bands, np.pi / bands
+    # Bisect the cutoff until |P| at the band edge is 1/sqrt(2), which makes the
+    # cosine-modulated bank nearly power complementary.
+    for _ in range(60):
+        cutoff = (low + high) / 2
+        prototype = np.sinc(cutoff * n / np.pi) * window
+        prototype /= np.sum(prototype)
+        if abs(np.sum(prototype * edge)) ** 2 > 0.5:
+            high = cutoff
+        else:
+            low = cutoff
+    return prototype
+
+
+class CosineModulatedFilterBank:
+    def __init__(self, bands, overlap=BANK_OVERLAP, beta=KAISER_BETA, dtype=None):
+        self.bands = bands
+        self.dtype = resolve_dtype(dtype)
+        prototype = design_prototype(bands, overlap, beta)
+        length = len(prototype)
+        n = np.arange(length) - (length - 1) / 2
+        band = np.arange(bands)[:, None]
+        modulation = (2 * band + 1) * np.pi / (2 * bands) * n
+        phase = (-1) ** band * np.pi / 4
+        self.analysis_taps = (2 * prototype * np.cos(modulation + phase)).astype(self.dtype)
+        synthesis_taps = 2 * bands * prototype * np.cos(modulation - phase)
+        self.synthesis_phases = synthesis_taps.reshape(bands, length // bands, bands).transpose(0, 2, 1).astype(self.dtype)
+        self.delay = length - 1
+        self.reset()
+
+    def reset(self):
+        self.analysis_history = np.zeros(self.analysis_taps.shape[1] - 1, dtype=self.dtype)
+        self.position = 0
+        self.synthesis_history = np.zeros((self.bands, self.synthesis_phases.shape[2] - 1), dtype=self.dtype)
+
+    def analyse(self, block):
+        block = np.asarray(block, dtype=self.dtype)
+        if not len(block):
+            return np.zeros((self.bands, 0), dtype=self.dtype)
+        buffer = np.concatenate([self.analysis_history, block])
+        start = (-self.position) % self.bands
+        windows = sliding_window_view(buffer, self.analysis_taps.shape[1])[start::self.bands]
+        self.analysis_history = buffer[len(buffer) - len(self.analysis_history):]
+        self.position += len(block)
+        return (windows @ self.analysis_taps[:, ::-1].T).T
+
+    def synthesise(self, band_block):
+        buffer = np.concatenate([self.synthesis_history, np.asarray(band_block, dtype=self.dtype)], axis=1)
+        windows = sliding_window_view(buffer, self.synthesis_phases.shape[2], axis=1)[:, :, ::-1]
+        self.synthesis_history = buffer[:, buffer.shape[1] - self.synthesis_history.shape[1]:]
+        return np.einsum('knj,kpj->np', windows, self.synthesis_phases).ravel()
+
+
+def process_band(filter, noised_band, clean_band=None, step_scale=1.0):
+    # The band's step scale multiplies its learning rate for this block only; the
+    # decay applied meanwhile is carried over to the unscaled rate.
+    learning_rate = filter.n
+    filter.n = scaled_rate = learning_rate * float(step_scale)
+    with np.errstate(over='ignore', invalid='ignore'):
+        output = filter.process_block(noised_band, clean_band)
+    filter.n = learning_rate * filter.n / scaled_rate if scaled_rate else learning_rate
+    return filter, output
+
+
+# Experimental: on the sub-band benchmark it does not beat a full-band filter yet.
+class SubbandAdaptiveFilter:
+    def __init__(self, filter, bands=4, overlap=BANK_OVERLAP, mode='batch', processes=None, normalized=True,
+                 pool=None):
+        if mode not in SUBBAND_MODES:
+            raise ValueError(f'Unknown sub-band mode: {mode}')
+        self.bands = bands
+        self.mode = mode
+        self.processes = processes
+        self.normalized = normalized
+        self.pool = pool
+        self.owns_pool = False
+        self.bank = CosineModulatedFilterBank(bands, overlap, dtype=filter.dtype)
+        self.clean_bank = copy.deepcopy(self.bank)
+        self.filters = [copy.deepcopy(filter) for _ in range(bands)]
+        self.reset()
+
+    @property
+    def delay(self):
+        return self.bank.delay
+
+    def reset(self):
+        self.bank.reset()
+        self.clean_bank.reset()
+        self.band_energy = np.zeros(self.bands)
+        self.band_samples = 0
+        for filter in self.filters:
+            filter.reset_state()
+
+    def get_step_scale(self, noised_bands):
+        # Per-band power normalisation: each band adapts at a rate independent of its
+        # share of the input spectrum, which is what speeds up convergence on coloured input.
+        self.band_energy += np.sum(np.square(noised_bands, dtype=np.float64), axis=1)
+        self.band_samples += noised_bands.shape[1]
+        power = self.band_energy / self.band_samples
+        scale = np.mean(power) / np.maximum(power, np.finfo(np.float64).tiny)
+        return scale.astype(self.bank.dtype)
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.get_context('spawn').Pool(self.processes)
+            self.owns_pool = True
+        return self.pool
+
+    def close(self):
+        if self.owns_pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool, self.owns_pool = None, False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def process_bands_batch(self, noised_bands, clean_bands=None, step_scale=None):
+        template = self.filters[0]
+        coefficients = np.stack([filter.coefficients for filter in self.filters])
+        state = np.stack([filter.state for filter in self.filters])
+        previous = None
+        if template.previous_output is not None:
+            previous = np.array([filter.previous_output for filter in self.filters], dtype=template.dtype)
+        with np.errstate(over='ignore', invalid='ignore'):
+            outputs, previous = process_members(template, coefficients, state, previous, noised_bands, clean_bands,
+                                                step_scale)
+        for index, filter in enumerate(self.filters):
+            filter.coefficients, filter.state, filter.n = coefficients[index], state[index], template.n
+            filter.previous_output = None if previous is None else previous[index]
+        return outputs
+
+    def process_bands_processes(self, noised_bands, clean_bands=None, step_scale=None):
+        clean_bands = [None] * self.bands if clean_bands is None else clean_bands
+        step_scale = [1.0] * self.bands if step_scale is None else step_scale
+        results = self.get_pool().starmap(process_band, zip(self.filters, noised_bands, clean_bands, step_scale))
+        self.filters = [filter for filter, _ in results]
+        return np.stack([output for _, output in results])
+
+    def process_block(self, noised_block, clean_block=None):
+        noised_bands = self.bank.analyse(noised_block)
+        clean_bands = None if clean_block is None else self.clean_bank.analyse(clean_block)
+        if noised_bands.shape[1] == 0:
+            return np.zeros(0, dtype=self.bank.dtype)
+        step_scale = self.get_step_scale(noised_bands) if self.normalized and clean_bands is not None else None
+        if self.mode == 'batch':
+            filtered_bands = self.process_bands_batch(noised_bands, clean_bands, step_scale)
+        else:
+            filtered_bands = self.process_bands_processes(noised_bands, clean_bands, step_scale)
+        return self.bank.synthesise(filtered_bands)
+
+    @profiled('SubbandAdaptiveFilter.train', samples=lambda result, *args, **kwargs: len(result))
+    def train(self, clean_y, noised_y):
+        self.reset()
+        return self.process_block(noised_y, clean_y)
+
+    @profiled('SubbandAdaptiveFilter.predict', samples=lambda result, *args, **kwargs: len(result))
+    def predict(self, noised_y):
+        self.bank.reset()
+        for filter in self.filters:
+            filter.start_stream()
+        return self.process_block(noised_y)
@@ -0,0 +1,85 @@
+import traceback
+from PyQt5.QtCore import QObject, QThread, Qt, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import QProgressDialog
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskWorker(QObject):
+    progress = pyqtSignal(int, int, object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+        self._cancel_requested = False
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def report_progress(self, done, total, partial_result=None):
+        if self._cancel_requested:
+            raise TaskCancelled()
+        self.progress.emit(done, total, partial_result)
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = self.task(self.report_progress)
+        except TaskCancelled:
+            self.cancelled.emit()
+            return
+        except Exception:
+            self.failed.emit(traceback.format_exc())
+            return
+        self.finished.emit(result)
+
+
+class TaskRunner:
+    def __init__(self, parent, label=None):
+        self.parent = parent
+        self.label = label
+        self.tasks = list()
+
+    def is_running(self):
+        return len(self.tasks) > 0
+
+    def cancel(self):
+        for _, worker, _ in self.tasks:
+            worker.cancel()
+
+    def start(self, task, on_finished, on_failed=None, on_progress=None):
+        thread = QThread()
+        worker = TaskWorker(task)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(on_finished)
+        if on_failed is not None:
+            worker.failed.connect(on_failed)
+        if on_progress is not None:
+            worker.progress.connect(on_progress)
+        dialog = None
+        if self.label is not None:
+            dialog = QProgressDialog(self.label, 'Скасувати', 0, 100, self.parent)
+            dialog.setWindowModality(Qt.NonModal)
+            dialog.setMinimumDuration(500)
+            dialog.canceled.connect(lambda: worker.cancel())
+            worker.progress.connect(lambda done, total, _: dialog.setValue(int(100 * done / total)) if total else None)
+        task_entry = (thread, worker, dialog)
+        for signal in [worker.finished, worker.failed, worker.cancelled]:
+            signal.connect(lambda *args: self._finish(task_entry))
+        self.tasks.append(task_entry)
+        thread.start()
+
+    def _finish(self, task_entry):
+        thread, _, dialog = task_entry
+        if dialog is not None:
+            dialog.canceled.disconnect()
+            dialog.close()
+        thread.quit()
+        thread.wait()
+        self.tasks.remove(task_entry)
@@ -0,0 +1,125 @@
+import argparse
+import os
+import time
+import numpy as np
+from source.filter_io import load_filter, read_checkpoint, get_filter_from_arrays, save_filter_checkpoint
+from source.io_utils import open_signal_array
+from source.profiling_utils import profiled
+
+
+DEFAULT_BLOCK_SIZE = 4096
+
+
+class TrainingCheckpointer:
+    def __init__(self, file_name, every_samples=None, every_seconds=None):
+        self.file_name = file_name
+        self.every_samples = every_samples
+        self.every_seconds = every_seconds
+        self.last_position = 0
+        self.last_time = time.monotonic()
+
+    def start(self, position):
+        self.last_position = position
+        self.last_time = time.monotonic()
+
+    def is_due(self, position):
+        if self.every_samples and position - self.last_position >= self.every_samples:
+            return True
+        return bool(self.every_seconds) and time.monotonic() - self.last_time >= self.every_seconds
+
+    def save(self, filter, position, total, output_file=None):
+        metadata = {'position': position, 'total': total, 'output_file': output_file}
+        save_filter_checkpoint(self.file_name, filter, metadata)
+        self.start(position)
+
+
+def get_block_size(checkpointer, block_size):
+    if checkpointer is not None and checkpointer.every_samples:
+        return min(block_size, checkpointer.every_samples)
+    return block_size
+
+
+def open_output(output_file, total, dtype, position):
+    if output_file is None:
+        return np.empty(total, dtype=dtype)
+    if position and os.path.exists(output_file):
+        return np.load(output_file, mmap_mode='r+')
+    return np.lib.format.open_memmap(output_file, mode='w+', dtype=dtype, shape=(total,))
+
+
+@profiled('training.train_resumable', samples=lambda result, filter, clean_y, *args, **kwargs: len(clean_y))
+def train_resumable(filter, clean_y, noised_y, checkpointer=None, position=0, output_file=None,
+                    block_size=DEFAULT_BLOCK_SIZE, progress_callback=None):
+    total = len(clean_y)
+    if len(noised_y) != total:
+        raise ValueError('Clean and noised signals must have the same length')
+    if position == 0:
+        filter.start_stream()
+    filtered = open_output(output_file, total, filter.dtype, position)
+    block_size = get_block_size(checkpointer, block_size)
+    if checkpointer is not None:
+        checkpointer.start(position)
+    while position < total:
+        end = min(position + block_size, total)
+        filtered[position:end] = filter.process_block(noised_y[position:end], clean_y[position:end])
+        position = end
+        if checkpointer is not None and (position == total or checkpointer.is_due(position)):
+            if isinstance(filtered, np.memmap):
+                filtered.flush()
+            checkpointer.save(filter, position, total, output_file)
+        if progress_callback:
+            progress_callback(position, total)
+    return filtered
+
+
+def load_training_checkpoint(file_name):
+    metadata, arrays = read_checkpoint(file_name)
+    return get_filter_from_arrays(metadata, arrays), metadata
+
+
+def resume_training(file_name, clean_y, noised_y, every_samples=None, every_seconds=None,
+                    block_size=DEFAULT_BLOCK_SIZE, progress_callback=None):
+    filter, metadata = load_training_checkpoint(file_name)
+    if metadata.get('total') != len(clean_y):
+        raise ValueError(f'Checkpoint was made for {metadata.get("total")} samples, got {len(clean_y)}')
+    checkpointer = TrainingCheckpointer(file_name, every_samples, every_seconds)
+    filtered = train_resumable(filter, clean_y, noised_y, checkpointer, metadata['position'],
+                               metadata.get('output_file'), block_size, progress_callback)
+    return filter, filtered
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Checkpointed filter training over file-backed signals')
+    parser.add_argument('clean', help='clean signal (.npy, .txt or raw binary)')
+    parser.add_argument('noised', help='noised signal (.npy, .txt or raw binary)')
+    parser.add_argument('checkpoint', help='training checkpoint (.npz)')
+    parser.add_argument('--filter', help='initial filter (.npz or .json), ignored when resuming')
+    parser.add_argument('--output', help='filtered signal output (.npy)')
+    parser.add_argument('--every-samples', type=int)
+    parser.add_argument('--every-seconds', type=float)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--dtype')
+    parser.add_argument('--resume', action='store_true')
+    arguments = parser.parse_args()
+    if not arguments.resume and arguments.filter is None:
+        parser.error('--filter is required unless --resume is given')
+    return arguments
+
+
+def main():
+    arguments = parse_arguments()
+    clean_y = open_signal_array(arguments.clean, arguments.dtype)
+    noised_y = open_signal_array(arguments.noised, arguments.dtype)
+    progress = lambda done, total: print(f'\r{done}/{total}', end='', flush=True)
+    if arguments.resume:
+        resume_training(arguments.checkpoint, clean_y, noised_y, arguments.every_samples,
+                        arguments.every_seconds, arguments.block_size, progress)
+    else:
+        filter = load_filter(arguments.filter)
+        checkpointer = TrainingCheckpointer(arguments.checkpoint, arguments.every_samples, arguments.every_seconds)
+        train_resumable(filter, clean_y, noised_y, checkpointer, 0, arguments.output, arguments.block_size, progress)
+    print()
+
+
+if __name__ == '__main__':
+    main()
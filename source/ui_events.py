@@ -1,127 +1,28 @@
-import random
 import os
 import traceback
 import numpy as np
-import json
-from source.filter_logic import FilterBuilder
-from source.signal_logic import SignalProcessor
-from source.analysis_utils import get_normalized_snr, get_impulse_characteristics, get_af_characteristics
+from source.filter_manager import FilterManager
 from source.popup_collection import MessagePopup, ErrorPopup
+from source.profiling_utils import profiled, profiled_slot
+from source.io_utils import read_signal_file, write_signal_file
+from source.task_worker import TaskRunner
+from source.plot_utils import MinMaxPyramid
+from source.stability_logic import FilterDivergenceError
 from PyQt5.QtWidgets import QFileDialog
 
 
-class FilterManager:
-    def __init__(self):
-        self.filter_builder = FilterBuilder()
-        self.signal_processor = SignalProcessor()
-        self.reset()
-        
-    def reset(self):
-        self.filter = self.filter_builder.get_new_filter()
-        self.signal_space = self.signal_processor.get_signal_space()
-        self.clean_signal = self.signal_processor.get_signal_space() * 0
-        self.noised_signal = self.signal_processor.get_signal_space() * 0
-        self.filtered_signal = self.signal_processor.get_signal_space() * 0
-
-    def filter_train(self):
-        self.filtered_signal = self.filter.train(self.clean_signal, self.noised_signal)
-
-    def filter_inference(self):
-        self.filtered_signal = self.filter.predict(self.noised_signal)
-
-    def reset_weights(self):
-        if self.filter == None:
-            return
-        self.filter.reset_weights()
-
-    def switch_status_weight(self, weight_index, group):
-        self.filter_builder.change_weight_status(self.filter, weight_index, group)
-
-    def show_weights(self):
-        if self.filter == None:
-            return "Filter is not initialized"
-        message = f"""Input weights: {self.filter.weights['in']}
-Output weights: {self.filter.weights['out']}"""
-        return message
-    
-    def add_weight(self, group, value_to_add):
-        if self.filter == None:
-            return
-        self.filter = self.filter_builder.add_weight(self.filter, group, value_to_add)
-
-    def remove_weight(self, weight_index, group):
-        if self.filter == None:
-            return
-        self.filter = self.filter_builder.remove_weight(self.filter, weight_index, group)
-
-    def get_af_characteristics(self):
-        amplitude_list = get_af_characteristics(self.filter)
-        return amplitude_list
-
-    def get_impulse_characteristics(self):
-        predict_filtered, impulse = get_impulse_characteristics(self.filter)
-        return predict_filtered, impulse
-
-    def get_snr(self, splits):
-        snr_value = get_normalized_snr(self.clean_signal, self.noised_signal, splits)
-        return snr_value
-
-    def reset_signal(self, apply_to_clean):
-        if apply_to_clean:
-            self.clean_signal = np.zeros(self.clean_signal.shape)
-        else:
-            self.noised_signal = np.zeros(self.noised_signal.shape)
-
-    def add_sine_signal(self, apply_to_clean, frequency, amplitude, phase, start, end):
-        input_signal = self.clean_signal if apply_to_clean else self.noised_signal
-        output = self.signal_processor.add_sine(self.signal_space, 
-                                                input_signal, 
-                                                frequency, 
-                                                amplitude, 
-                                                phase, 
-                                                start, 
-                                                end)
-        if apply_to_clean:
-            self.clean_signal = output
-        else:
-            self.noised_signal = output
-
-    def add_line_signal(self, apply_to_clean, angle, offset, start, end):
-        input_signal = self.clean_signal if apply_to_clean else self.noised_signal
-        output = self.signal_processor.add_linear(self.signal_space, 
-                                                input_signal, 
-                                                angle, 
-                                                offset, 
-                                                start, 
-                                                end)
-        if apply_to_clean:
-            self.clean_signal = output
-        else:
-            self.noised_signal = output
-
-    def add_noise_signal(self, apply_to_clean, amplitude, start, end):
-        input_signal = self.clean_signal if apply_to_clean else self.noised_signal
-        output = self.signal_processor.add_noise(self.signal_space, 
-                                                input_signal, 
-                                                amplitude, 
-                                                start, 
-                                                end)
-        if apply_to_clean:
-            self.clean_signal = output
-        else:
-            self.noised_signal = output
-
-    def generate_signal_space(self, n_points, a, b):
-        self.signal_space = np.linspace(a, b, n_points)
-        self.clean_signal = 0 * self.signal_space
-        self.noised_signal = 0 * self.signal_space
+def count_plotted_samples(result, events, *args, **kwargs):
+    return len(events.filter_manager.signal_space)
 
 
 class EventsRepository:
     def __init__(self, ui):
         self.ui = ui
         self.filter_manager = FilterManager()
+        self.launch_runner = TaskRunner(ui, 'Виконання фільтрації...')
+        self.graphs_runner = TaskRunner(ui, 'Обчислення характеристик фільтра...')
 
+    @profiled_slot('EventsRepository.snr_push')
     def snr_push(self):
         try:
             title = 'SNR'
@@ -133,27 +34,52 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Обчислення SNR')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.launch_push')
     def launch_push(self):
         try:
+            if self.launch_runner.is_running():
+                return
+            filter = self.filter_manager.get_filter_snapshot()
+            clean_signal, noised_signal = self.filter_manager.get_signals_snapshot()
             if self.ui.radioButton_train.isChecked():
                 epoch_n = int(self.ui.lineEdit_epoch.text())
                 if epoch_n < 0:
                     raise Exception("")
-                for _ in range(epoch_n):
-                    self.filter_manager.filter_train()
-                    self.refresh_plot_main()
+                task = lambda progress: self.filter_manager.train_snapshot(filter, clean_signal, noised_signal, epoch_n, progress)
+            elif self.ui.radioButton_solve.isChecked():
+                epoch_n = int(self.ui.lineEdit_epoch.text())
+                if epoch_n < 0:
+                    raise Exception("")
+                task = lambda progress: self.filter_manager.solve_snapshot(filter, clean_signal, noised_signal, epoch_n, progress)
             else:
-                self.filter_manager.filter_inference()
-                self.refresh_plot_main()
+                task = lambda progress: self.filter_manager.predict_snapshot(filter, noised_signal, progress)
+            self.launch_runner.start(task, self.launch_finished, self.launch_failed, self.launch_progress)
         except:
             ErrorPopup().show_popup('Введено некоректні дані', 'Запуск фільтра')
+
+    def launch_progress(self, done, total, filtered_signal):
+        if filtered_signal is not None:
+            self.refresh_plot_main(filtered_signal)
+
+    def launch_finished(self, result):
+        self.filter_manager.apply_filter_result(*result)
+        self.refresh_plot_main()
+
+    def launch_failed(self, error):
+        if FilterDivergenceError.__name__ in error:
+            ErrorPopup().show_popup('Фільтр став нестійким, запуск зупинено', 'Запуск фільтра')
+        else:
+            ErrorPopup().show_popup('Помилка', 'Запуск фільтра')
+        print(error)
         
+    @profiled_slot('EventsRepository.reset_weights_push')
     def reset_weights_push(self):
         try:
             self.filter_manager.reset_weights()
         except:
             ErrorPopup().show_popup('Помилка', 'Не вдається скинути ваги')
 
+    @profiled_slot('EventsRepository.show_weights_push')
     def show_weights_push(self):
         try:
             title = "Filter weights"
@@ -163,20 +89,35 @@ class EventsRepository:
             ErrorPopup().show_popup('Помилка', 'Не вдається показати ваги')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.refresh_filter_graphs')
     def refresh_filter_graphs(self):
         try:
-            afc_array = self.filter_manager.get_af_characteristics()
-            self.refresh_plot_afc(afc_array)
-            ic_array, impulse = self.filter_manager.get_impulse_characteristics()
-            self.refresh_plot_ic(ic_array, impulse)
+            self.graphs_runner.cancel()
+            cached_characteristics = self.filter_manager.get_cached_filter_characteristics()
+            if cached_characteristics is not None:
+                self.filter_graphs_finished(cached_characteristics)
+                return
+            filter = self.filter_manager.get_filter_snapshot()
+            task = lambda progress: self.filter_manager.get_filter_characteristics(filter, progress)
+            self.graphs_runner.start(task, self.filter_graphs_finished, self.filter_graphs_failed)
         except:
             ErrorPopup().show_popup('Помилка', 'Не оновити графіки сигналів')
             print(traceback.format_exc())
 
+    def filter_graphs_finished(self, result):
+        afc_array, ic_array, impulse = result
+        self.refresh_plot_afc(afc_array)
+        self.refresh_plot_ic(ic_array, impulse)
+
+    def filter_graphs_failed(self, error):
+        ErrorPopup().show_popup('Помилка', 'Не оновити графіки сигналів')
+        print(error)
+
+    @profiled_slot('EventsRepository.add_weight_push')
     def add_weight_push(self):
         try:
             if self.ui.checkBox_random_value.isChecked():
-                value_to_add = random.random()
+                value_to_add = self.filter_manager.rng.random()
             else:
                 value_to_add = float(self.ui.lineEdit_initial_value.text())
             if self.ui.radioButton_in_signal_add.isChecked():
@@ -189,6 +130,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Додавання ваги')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.delete_weight_push')
     def delete_weight_push(self):
         try:
             weight_index = int(self.ui.lineEdit_weight_number.text())
@@ -202,6 +144,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Видалення ваги')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.switch_status_weight_push')
     def switch_status_weight_push(self):
         try:
             weight_index = int(self.ui.lineEdit_weight_number.text())
@@ -215,22 +158,23 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Вимкнення ваги')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.save_filter_push')
     def save_filter_push(self):
         try:
-            self.save_filter_as(self.filter_manager.filter.weights)
+            self.save_filter_as()
         except:
             ErrorPopup().show_popup('Помилка', 'Не вдається зберегти ваги фільтра')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.load_filter_push')
     def load_filter_push(self):
         try:
-            self.filter_manager.filter.weights = self.load_filter()
-            self.filter_manager.filter.input_values['in'] = [0] * len(self.filter_manager.filter.weights['in'])
-            self.filter_manager.filter.input_values['out'] = [0] * len(self.filter_manager.filter.weights['out'])
+            self.load_filter()
         except:
             ErrorPopup().show_popup('Помилка', 'Не вдається завантажити ваги фільтра')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.reset_push')
     def reset_push(self):
         try:
             if self.ui.radioButton_clean_signal.isChecked():
@@ -243,6 +187,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Помилка', 'Не вдається скинути сигнал')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.save_push')
     def save_push(self):
         try:
             if self.ui.radioButton_clean_signal.isChecked():
@@ -254,6 +199,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Помилка', 'Не вдається зберегти сигнал')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.load_push')
     def load_push(self):
         try:
             signal_space, signal = self.load_signal()
@@ -267,6 +213,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Помилка', 'Не вдається завантажити сигнал')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.add_sine_push')
     def add_sine_push(self):
         try:
             if self.ui.radioButton_clean_signal.isChecked():
@@ -284,6 +231,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Додавання синусоїди')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.add_line_push')
     def add_line_push(self):
         try:
             if self.ui.radioButton_clean_signal.isChecked():
@@ -300,6 +248,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Додавання лінійного сигналу')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.add_noise_push')
     def add_noise_push(self):
         try:
             if self.ui.radioButton_clean_signal.isChecked():
@@ -315,6 +264,7 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Додавання шуму')
             print(traceback.format_exc())
 
+    @profiled_slot('EventsRepository.signal_generate_push')
     def signal_generate_push(self):
         try:
             n_points = int(self.ui.lineEdit_point_n.text())
@@ -326,33 +276,33 @@ class EventsRepository:
             ErrorPopup().show_popup('Введено некоректні дані', 'Генерація сигналів')
             print(traceback.format_exc())
 
-    def refresh_plot_main(self):
-        self.ui.MplWidget_main.canvas.axes.cla()
-        self.ui.MplWidget_main.canvas.axes.plot(self.filter_manager.signal_space, self.filter_manager.clean_signal[:len(self.filter_manager.signal_space)], c='blue')
-        self.ui.MplWidget_main.canvas.axes.plot(self.filter_manager.signal_space, self.filter_manager.filtered_signal[:len(self.filter_manager.signal_space)], c='red')
-        self.ui.MplWidget_main.canvas.axes.scatter(self.filter_manager.signal_space, self.filter_manager.noised_signal[:len(self.filter_manager.signal_space)], c='orange')
-        self.ui.MplWidget_main.canvas.axes.grid()
-        self.ui.MplWidget_main.canvas.draw()
+    @profiled('EventsRepository.refresh_plot_main', samples=count_plotted_samples)
+    def refresh_plot_main(self, filtered_signal=None):
+        if filtered_signal is not None:
+            filtered_pyramid = MinMaxPyramid(self.filter_manager.signal_space, filtered_signal)
+        else:
+            filtered_pyramid = self.filter_manager.get_signal_pyramid('filtered_signal')
+        self.ui.MplWidget_main.set_line('clean', self.filter_manager.get_signal_pyramid('clean_signal'), c='blue')
+        self.ui.MplWidget_main.set_line('filtered', filtered_pyramid, c='red')
+        self.ui.MplWidget_main.set_line('noised', self.filter_manager.get_signal_pyramid('noised_signal'), c='orange', linestyle='None', marker='o', markersize=3)
+        self.ui.MplWidget_main.refresh()
 
+    @profiled('EventsRepository.refresh_plot_signal', samples=count_plotted_samples)
     def refresh_plot_signal(self):
-        self.ui.MplWidget_signal.canvas.axes.cla()
-        self.ui.MplWidget_signal.canvas.axes.plot(self.filter_manager.signal_space, self.filter_manager.clean_signal[:len(self.filter_manager.signal_space)], c='blue')
-        self.ui.MplWidget_signal.canvas.axes.scatter(self.filter_manager.signal_space, self.filter_manager.noised_signal[:len(self.filter_manager.signal_space)], c='orange')
-        self.ui.MplWidget_signal.canvas.axes.grid()
-        self.ui.MplWidget_signal.canvas.draw()
+        self.ui.MplWidget_signal.set_line('clean', self.filter_manager.get_signal_pyramid('clean_signal'), c='blue')
+        self.ui.MplWidget_signal.set_line('noised', self.filter_manager.get_signal_pyramid('noised_signal'), c='orange', linestyle='None', marker='o', markersize=3)
+        self.ui.MplWidget_signal.refresh()
 
+    @profiled('EventsRepository.refresh_plot_afc')
     def refresh_plot_afc(self, afc_array):
-        self.ui.MplWidget_afc.canvas.axes.cla()
-        self.ui.MplWidget_afc.canvas.axes.plot(afc_array, c='blue')
-        self.ui.MplWidget_afc.canvas.axes.grid()
-        self.ui.MplWidget_afc.canvas.draw()
+        self.ui.MplWidget_afc.set_line('afc', MinMaxPyramid(np.arange(len(afc_array)), afc_array), c='blue')
+        self.ui.MplWidget_afc.refresh()
 
+    @profiled('EventsRepository.refresh_plot_ic')
     def refresh_plot_ic(self, ic_array, impulse):
-        self.ui.MplWidget_ic.canvas.axes.cla()
-        self.ui.MplWidget_ic.canvas.axes.plot(ic_array, c='blue')
-        self.ui.MplWidget_ic.canvas.axes.scatter(range(len(impulse)), impulse, c='orange')
-        self.ui.MplWidget_ic.canvas.axes.grid()
-        self.ui.MplWidget_ic.canvas.draw()
+        self.ui.MplWidget_ic.set_line('ic', MinMaxPyramid(np.arange(len(ic_array)), ic_array), c='blue')
+        self.ui.MplWidget_ic.set_line('impulse', MinMaxPyramid(np.arange(len(impulse)), impulse), c='orange', linestyle='None', marker='o')
+        self.ui.MplWidget_ic.refresh()
 
     def save_signal_as(self, signal, signal_space):
         options = QFileDialog.Options()
@@ -360,8 +310,7 @@ class EventsRepository:
         fileName, _ = QFileDialog.getSaveFileName(self.ui, 
             "Save File", "", "Text Files(*.txt)", options = options)
         if fileName:
-            with open(fileName, 'w') as f:
-                f.write('\n'.join([f'{str(signal_space[index])}\t{str(value)}' for index, value in enumerate(signal)]))
+            write_signal_file(fileName, signal, signal_space)
             self.ui.setWindowTitle(str(os.path.basename(fileName)) + " - Notepad Alpha[*]")
 
     def load_signal(self):
@@ -369,35 +318,24 @@ class EventsRepository:
         options |= QFileDialog.DontUseNativeDialog
         fileName, _ = QFileDialog.getOpenFileName(self.ui, 
             "Load File", "", "Text Files(*.txt)", options = options)
-        signal_space, signal = list(), list()
         if not fileName:
-            return signal_space, signal
-        with open(fileName, 'r') as f:
-            for line in f.readlines():
-                space_value, signal_value = tuple(line.split('\t')[:2])
-                signal_space.append(float(space_value))
-                signal.append(float(signal_value.replace('\n', '')))
-        return signal_space, signal
+            return list(), list()
+        return read_signal_file(fileName)
 
 
-    def save_filter_as(self, filter_weights):
+    def save_filter_as(self):
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
         fileName, _ = QFileDialog.getSaveFileName(self.ui, 
-            "Save File", "", "JSON Files(*.json)", options = options)
+            "Save File", "", "Filter Checkpoints(*.npz);;JSON Files(*.json)", options = options)
         if fileName:
-            with open(fileName, "w") as outfile:
-                json.dump(filter_weights, outfile)
+            self.filter_manager.save_filter(fileName)
             self.ui.setWindowTitle(str(os.path.basename(fileName)) + " - Notepad Alpha[*]")
 
     def load_filter(self):
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
         fileName, _ = QFileDialog.getOpenFileName(self.ui, 
-            "Load File", "", "JSON Files(*.json)", options = options)
-        signal_space, signal = list(), list()
-        if not fileName:
-            return signal_space, signal
-        with open(fileName, 'r') as f:
-            filter_weights = json.load(f)
-        return filter_weights
+            "Load File", "", "Filter Files(*.npz *.json);;Filter Checkpoints(*.npz);;JSON Files(*.json)", options = options)
+        if fileName:
+            self.filter_manager.load_filter(fileName)
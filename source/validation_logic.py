@@ -0,0 +1,161 @@
+import argparse
+import copy
+import multiprocessing
+import numpy as np
+from source.analysis_utils import get_snr_db
+from source.filter_io import load_filter
+from source.io_utils import open_signal_array
+from source.profiling_utils import profiled
+from source.shared_signals import SharedSignalRegistry, attach_signals
+
+
+VALIDATION_METHODS = ['kfold', 'segments']
+VALIDATION_MODES = ['serial', 'processes']
+worker_signals = None
+
+
+class ValidationReport:
+    def __init__(self, method, train_samples, test_ranges, input_snr, output_snr, fold_coefficients):
+        self.method = method
+        self.train_samples = train_samples
+        self.test_ranges = test_ranges
+        self.input_snr = input_snr
+        self.output_snr = output_snr
+        self.fold_coefficients = fold_coefficients
+
+    @property
+    def snr_gain(self):
+        return self.output_snr - self.input_snr
+
+    def summary(self):
+        return {
+            'folds': len(self.output_snr),
+            'output_snr_mean': float(np.mean(self.output_snr)),
+            'output_snr_std': float(np.std(self.output_snr)),
+            'snr_gain_mean': float(np.mean(self.snr_gain)),
+            'snr_gain_min': float(np.min(self.snr_gain)),
+        }
+
+    def format(self):
+        header = ['fold', 'train', 'test', 'input SNR, dB', 'output SNR, dB', 'gain, dB']
+        rows = [[str(index + 1), str(train), str(stop - start), f'{input_snr:.2f}', f'{output_snr:.2f}', f'{gain:.2f}']
+                for index, (train, (start, stop), input_snr, output_snr, gain)
+                in enumerate(zip(self.train_samples, self.test_ranges, self.input_snr, self.output_snr, self.snr_gain))]
+        rows.append(['mean', '', '', f'{np.mean(self.input_snr):.2f}', f'{np.mean(self.output_snr):.2f}',
+                     f'{np.mean(self.snr_gain):.2f}'])
+        rows.append(['std', '', '', f'{np.std(self.input_snr):.2f}', f'{np.std(self.output_snr):.2f}',
+                     f'{np.std(self.snr_gain):.2f}'])
+        widths = [max(len(value) for value in column) for column in zip(header, *rows)]
+        lines = ['  '.join(value.rjust(width) for value, width in zip(row, widths)) for row in [header] + rows]
+        return f'{self.method} cross-validation\n' + '\n'.join(lines)
+
+
+def get_folds(length, folds=5, method='kfold'):
+    if method not in VALIDATION_METHODS:
+        raise ValueError(f'Unknown validation method: {method}')
+    if folds < 2 or folds > length:
+        raise ValueError('Cross-validation needs at least two folds and one sample per fold')
+    edges = np.linspace(0, length, folds + 1).astype(int).tolist()
+    if method == 'segments':
+        return [([(0, edges[index])], (edges[index], edges[index + 1])) for index in range(1, folds)]
+    result = list()
+    for index in range(folds):
+        train_ranges = [(start, stop) for start, stop in [(0, edges[index]), (edges[index + 1], length)] if stop > start]
+        result.append((train_ranges, (edges[index], edges[index + 1])))
+    return result
+
+
+def initialize_worker(descriptors):
+    global worker_signals
+    worker_signals = attach_signals(descriptors)
+
+
+def run_fold(filter, train_ranges, test_range, epoch_n, signals=None):
+    signals = worker_signals if signals is None else signals
+    clean_y, noised_y = signals['clean_signal'], signals['noised_signal']
+    filter = copy.deepcopy(filter)
+    position = None
+    with np.errstate(over='ignore', invalid='ignore'):
+        for _ in range(epoch_n):
+            for start, stop in train_ranges:
+                # The delay line only carries over into a range that continues where the
+                # filter stopped, never across the held-out block.
+                if start != position:
+                    filter.reset_state()
+                filter.train(clean_y[start:stop], noised_y[start:stop])
+                position = stop
+        if test_range[0] != position:
+            filter.reset_state()
+        filtered_y = filter.predict(noised_y[test_range[0]:test_range[1]])
+    return filter.coefficients, filtered_y
+
+
+def run_pool(filter, folds, epoch_n, descriptors, processes=None):
+    arguments = [(filter, train_ranges, test_range, epoch_n) for train_ranges, test_range in folds]
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=initialize_worker, initargs=(descriptors,)) as pool:
+        return pool.starmap(run_fold, arguments)
+
+
+def run_folds_processes(filter, folds, epoch_n, clean_y, noised_y, descriptors=None, processes=None):
+    if descriptors is not None:
+        return run_pool(filter, folds, epoch_n, descriptors, processes)
+    with SharedSignalRegistry() as registry:
+        registry.publish('clean_signal', clean_y)
+        registry.publish('noised_signal', noised_y)
+        return run_pool(filter, folds, epoch_n, registry.get_descriptors(), processes)
+
+
+@profiled('validation.cross_validate', samples=lambda result, filter, clean_y, *args, **kwargs: len(clean_y))
+def cross_validate(filter, clean_y, noised_y, folds=5, method='kfold', epoch_n=1, mode='processes', processes=None,
+                   descriptors=None):
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f'Unknown validation mode: {mode}')
+    length = min(len(clean_y), len(noised_y))
+    clean_y, noised_y = clean_y[:length], noised_y[:length]
+    fold_ranges = get_folds(length, folds, method)
+    filter = copy.deepcopy(filter)
+    filter.reset_state()
+    if mode == 'serial':
+        signals = {'clean_signal': clean_y, 'noised_signal': noised_y}
+        results = [run_fold(filter, train_ranges, test_range, epoch_n, signals) for train_ranges, test_range in fold_ranges]
+    else:
+        results = run_folds_processes(filter, fold_ranges, epoch_n, clean_y, noised_y, descriptors, processes)
+    test_ranges = [test_range for _, test_range in fold_ranges]
+    filtered_y = np.concatenate([filtered for _, filtered in results])
+    # filtered_y holds the consecutive test ranges back to back, so every fold is scored
+    # in one pass.
+    offset, end = test_ranges[0][0], test_ranges[-1][1]
+    starts = [start - offset for start, _ in test_ranges]
+    input_snr = get_snr_db(clean_y[offset:end], noised_y[offset:end], starts)
+    output_snr = get_snr_db(clean_y[offset:end], filtered_y, starts)
+    train_samples = [sum(stop - start for start, stop in train_ranges) for train_ranges, _ in fold_ranges]
+    return ValidationReport(method, train_samples, test_ranges, input_snr, output_snr,
+                            np.stack([coefficients for coefficients, _ in results]))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Cross-validate a filter on file-backed signals')
+    parser.add_argument('clean', help='clean signal (.npy, .txt or raw binary)')
+    parser.add_argument('noised', help='noised signal (.npy, .txt or raw binary)')
+    parser.add_argument('filter', help='filter to validate (.npz or .json)')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--method', choices=VALIDATION_METHODS, default='kfold')
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--mode', choices=VALIDATION_MODES, default='processes')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--dtype')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    clean_y = open_signal_array(arguments.clean, arguments.dtype)
+    noised_y = open_signal_array(arguments.noised, arguments.dtype)
+    report = cross_validate(load_filter(arguments.filter), clean_y, noised_y, arguments.folds, arguments.method,
+                            arguments.epochs, arguments.mode, arguments.processes)
+    print(report.format())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import numpy as np
+from source.profiling_utils import profiled
+
+
+WIENER_REGULARIZATION = 1e-9
+# LMS refinement after a solve runs at this fraction of the filter's step size: at the
+# full step its misadjustment undoes most of the solution's gain.
+WIENER_REFINE_SCALE = 0.01
+
+
+def get_correlations(clean_y, noised_y, lags):
+    length = min(len(clean_y), len(noised_y))
+    # The filter passes the first sample through and never feeds it into the 'in' taps,
+    # so it takes no part in the fit.
+    noised = np.asarray(noised_y[:length], dtype=np.float64).copy()
+    clean = np.asarray(clean_y[:length], dtype=np.float64).copy()
+    noised[:1], clean[:1] = 0, 0
+    fft_size = 1 << int(length + lags - 1).bit_length()
+    noised_spectrum = np.fft.rfft(noised, fft_size)
+    autocorrelation = np.fft.irfft(noised_spectrum * np.conj(noised_spectrum), fft_size)[:lags]
+    cross_correlation = np.fft.irfft(np.fft.rfft(clean, fft_size) * np.conj(noised_spectrum), fft_size)[:lags]
+    return autocorrelation, cross_correlation
+
+
+def solve_toeplitz(autocorrelation, right_side):
+    size = len(right_side)
+    predictor = np.zeros(size)
+    predictor[0] = 1
+    error = autocorrelation[0]
+    solution = np.zeros(size)
+    solution[0] = right_side[0] / error
+    for order in range(1, size):
+        lagged = autocorrelation[order:0:-1]
+        reflection = -np.dot(predictor[:order], lagged) / error
+        predictor[:order + 1] += reflection * predictor[order::-1].copy()
+        error *= 1 - reflection ** 2
+        step = (right_side[order] - np.dot(solution[:order], lagged)) / error
+        solution[:order + 1] += step * predictor[order::-1]
+    return solution
+
+
+def get_wiener_weights(filter, clean_y, noised_y, regularization=WIENER_REGULARIZATION):
+    in_slice = filter.get_group_slice('in')
+    positions = np.flatnonzero(filter.statuses[in_slice])
+    if not len(positions):
+        return positions, np.zeros(0)
+    autocorrelation, cross_correlation = get_correlations(clean_y, noised_y, positions[-1] + 1)
+    if autocorrelation[0] <= 0:
+        return positions, np.zeros(len(positions))
+    autocorrelation[0] *= 1 + regularization
+    if positions[-1] - positions[0] == len(positions) - 1:
+        weights = solve_toeplitz(autocorrelation[:len(positions)], cross_correlation[positions])
+    else:
+        matrix = autocorrelation[np.abs(positions[:, None] - positions[None, :])]
+        weights = np.linalg.solve(matrix, cross_correlation[positions])
+    return positions, weights
+
+
+@profiled('wiener.solve_filter', samples=lambda result, filter, clean_y, noised_y, *args, **kwargs: len(clean_y))
+def solve_filter(filter, clean_y, noised_y, regularization=WIENER_REGULARIZATION):
+    positions, weights = get_wiener_weights(filter, clean_y, noised_y, regularization)
+    filter.coefficients[filter.get_group_slice('in').start + positions] = weights
+    out_slice = filter.get_group_slice('out')
+    filter.coefficients[out_slice][filter.statuses[out_slice]] = 0
+    return filter